@@ -0,0 +1,279 @@
+import argparse
+import itertools
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from camera import Camera
+from cell_aggregates import cell_size_for
+from demos import DEMOS, load_demo
+from flocking import approximate_flock_steering
+from profiler import FrameProfiler
+from telemetry import polarization
+
+
+def make_blocks(block_class, count, width, height, rng):
+    return [block_class(rng.randint(0, width), rng.randint(0, height)) for _ in range(count)]
+
+
+def boid_bytes(sim, sample=1000):
+    # Memory for one more boid of this simulation (the object and its
+    # vectors), averaged over `sample` new boids that are then thrown away.
+    # The random state is put back so the run itself is unchanged.
+    state = sim.world.rng.getstate()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    boids = [sim.new_boid() for _ in range(sample)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    sim.world.rng.setstate(state)
+    del boids
+    return used / sample
+
+
+def flock_error(sim, sample=200):
+    # How far the approximate alignment and cohesion (at the world's
+    # flock_approximation) are from the exact Boid.align and Boid.cohesion,
+    # for up to `sample` boids at their current positions: (mean, max) of
+    # the length of the difference for each force, in units of max_force
+    world, boids = sim.world, sim.boids
+    world.cell_aggregates.rebuild(boids, cell_size_for(world.neighbor_radius), world.width, world.height)
+    world.obstacle_map.sync(sim.blocks, world.width, world.height, world.object_separation_radius)
+    errors = {"alignment": [], "cohesion": []}
+    for boid in boids[:sample]:
+        ax, ay, cx, cy, _, _ = approximate_flock_steering(
+            boid, world.cell_aggregates, world.obstacle_map, world.neighbor_radius, world.separation_radius,
+            world.max_speed, world.max_force, world.flock_approximation)
+        errors["alignment"].append(boid.align(world, boids).distance_to((ax, ay)))
+        errors["cohesion"].append(boid.cohesion(world, boids).distance_to((cx, cy)))
+    return {force: (sum(values) / len(values), max(values)) if values else (0.0, 0.0)
+            for force, values in errors.items()}
+
+
+def steering_drift(sim):
+    # How far the flocking force each boid steers by (Boid.steering, which
+    # with steering_slices > 1 can be several steps old) is from one
+    # computed for the current positions: (mean, max) of the difference,
+    # in units of max_force. With one slice it is only a step old, which
+    # gives the baseline to compare other slice counts with.
+    world, boids = sim.world, sim.boids
+    radius = max(world.neighbor_radius, world.separation_radius)
+    world.neighbor_grid.rebuild(boids, radius, world.width, world.height)
+    if world.flock_approximation is not None:
+        world.cell_aggregates.rebuild(boids, cell_size_for(world.neighbor_radius), world.width, world.height)
+    else:
+        world.neighbor_list.update(boids, radius, world.neighbor_skin)
+    world.obstacle_map.sync(sim.blocks, world.width, world.height, world.object_separation_radius)
+    drift = []
+    for boid in boids:
+        x, y = boid.steering_force(world)
+        drift.append(math.hypot(x - boid.steering.x, y - boid.steering.y))
+    return (sum(drift) / len(drift), max(drift)) if drift else (0.0, 0.0)
+
+
+def run_case(scenario, engine, num_boids, num_blocks, neighbor_radius, frames, time_limit, seed, approximation=None,
+             slices=1, num_objects=None, world_size=None, lod=True):
+    # Run one scenario for a fixed number of frames (or until time_limit
+    # seconds have passed) and return its timings.
+    import pygame
+
+    demo = load_demo(scenario)
+    # The soccer demo has no Block class of its own; its boids handle any
+    # object with a position and get_rect(), so the pure-swarm one is used.
+    block_class = load_demo("pure-swarm").Block
+
+    world = demo.default_world()
+    world.neighbor_radius = neighbor_radius
+    world.flock_approximation = approximation
+    world.steering_slices = slices
+    if world_size is not None:
+        world.width = world.height = world_size
+    world.rng.seed(seed)
+    if engine == "numpy":
+        sim = demo.Simulation(num_boids=num_boids, use_numpy=True, world=world)
+    elif num_objects is not None:
+        sim = demo.Simulation(num_boids=num_boids, world=world, num_objects=num_objects)
+    else:
+        sim = demo.Simulation(num_boids=num_boids, world=world)
+    sim.blocks.extend(make_blocks(block_class, num_blocks, world.width, world.height, random.Random(seed)))
+    if world_size is None:
+        screen = pygame.Surface((world.width, world.height))
+        camera = None
+    else:
+        # A window of the demo's size onto the middle of the world
+        screen = pygame.Surface((demo.WIDTH, demo.HEIGHT))
+        camera = Camera(demo.WIDTH, demo.HEIGHT, world.width, world.height)
+        camera.center_on(world.width / 2, world.height / 2)
+    if not lod:
+        sim.splats.max_agents = sim.splats.max_level = None  # every boid drawn on its own
+    bytes_per_boid = boid_bytes(sim)
+
+    sim.profiler = FrameProfiler(history=frames)
+    done = 0
+    start = time.perf_counter()
+    while done < frames:
+        sim.step(1000 / 30)
+        with sim.profiler.phase("draw"):
+            sim.draw_background(screen, camera)
+            sim.draw(screen, camera=camera)
+        done += 1
+        if time.perf_counter() - start > time_limit:
+            break
+    sim.profiler.end_frame()
+    elapsed = time.perf_counter() - start
+
+    phase_stats = sim.profiler.stats()
+    del phase_stats["frame"], phase_stats["work"]
+
+    case = {
+        "scenario": scenario,
+        "engine": engine,
+        "boids": num_boids,
+        "blocks": num_blocks,
+        "neighbor_radius": neighbor_radius,
+        "approximation": approximation,
+        "slices": slices,
+        "objects": num_objects,
+        "world": world_size,
+        "lod": lod,
+        "frames": done,
+        "seconds": elapsed,
+        "steps_per_sec": done / elapsed if elapsed > 0 else float("inf"),
+        "bytes_per_boid": bytes_per_boid,
+        "phase_ms": {name: stats["avg"] for name, stats in phase_stats.items()},
+        "phase_p95_ms": {name: stats["p95"] for name, stats in phase_stats.items()},
+        "polarization": polarization(sim.boids),
+    }
+    if approximation is not None:
+        case["flock_error"] = flock_error(sim)
+    if engine == "objects" and hasattr(demo.Boid, "steering_force"):
+        case["steering_drift"] = steering_drift(sim)
+    return case
+
+
+def case_key(case):
+    return (case["scenario"], case["engine"], case["boids"], case["blocks"], case["neighbor_radius"],
+            case.get("approximation"), case.get("slices", 1), case.get("objects"), case.get("world"),
+            case.get("lod", True))
+
+
+def compare(results, baseline, tolerance):
+    # Print the speed of each case relative to the baseline file. Returns
+    # the number of cases that got slower by more than the tolerance.
+    old = {case_key(case): case for case in baseline["cases"]}
+    regressions = 0
+    for case in results["cases"]:
+        before = old.get(case_key(case))
+        if before is None:
+            continue
+        ratio = case["steps_per_sec"] / before["steps_per_sec"]
+        flag = ""
+        if ratio < 1 - tolerance:
+            flag = "  SLOWER"
+            regressions += 1
+        print(f"{format_case(case):<60} {before['steps_per_sec']:10.1f} -> {case['steps_per_sec']:10.1f} steps/sec ({ratio:.2f}x){flag}")
+    return regressions
+
+
+def format_case(case):
+    options = "" if case.get("approximation") is None else f" approx={case['approximation']}"
+    if case.get("slices", 1) != 1:
+        options += f" slices={case['slices']}"
+    if case.get("objects") is not None:
+        options += f" objects={case['objects']}"
+    if case.get("world") is not None:
+        options += f" world={case['world']}"
+    if not case.get("lod", True):
+        options += " no-lod"
+    return (f"{case['scenario']} [{case['engine']}] boids={case['boids']} "
+            f"blocks={case['blocks']} radius={case['neighbor_radius']}{options}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-frame cost of the swarm demos.")
+    parser.add_argument("--scenarios", nargs="+", default=["pure-swarm", "swarm-soccer"], choices=sorted(DEMOS))
+    parser.add_argument("--boids", nargs="+", type=int, default=[10, 100, 1000, 10000])
+    parser.add_argument("--blocks", nargs="+", type=int, default=[0, 100])
+    parser.add_argument("--radius", nargs="+", type=int, default=[200], help="NEIGHBOR_RADIUS values")
+    parser.add_argument("--approximation", nargs="+", type=float, default=[],
+                        help="also run with approximate flocking at these levels (0-1) and measure its error")
+    parser.add_argument("--slices", nargs="+", type=int, default=[],
+                        help="also run with staggered steering at these slice counts (0 = adaptive)")
+    parser.add_argument("--objects", nargs="+", type=int, default=[None],
+                        help="balls in the swarm-soccer cases (default: the demo's NUM_OBJECTS)")
+    parser.add_argument("--world", nargs="+", type=int, default=[None],
+                        help="world width and height; larger than the window, only the middle is drawn")
+    parser.add_argument("--no-lod", action="store_true",
+                        help="draw every boid as a triangle or sprite, however many there are")
+    parser.add_argument("--numpy", action="store_true", help="also run pure-swarm on the NumPy engine")
+    parser.add_argument("--frames", type=int, default=60, help="frames per case")
+    parser.add_argument("--time-limit", type=float, default=20, help="stop a case early after this many seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json", help="where to write the results")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed slowdown vs. the baseline (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    import pygame
+    pygame.init()
+    pygame.display.set_mode((1, 1))  # the ant sprite needs a display to convert to
+
+    runs = []
+    for scenario in args.scenarios:
+        runs.append((scenario, "objects"))
+        if args.numpy and scenario == "pure-swarm":
+            runs.append((scenario, "numpy"))
+
+    results = {
+        "python": sys.version.split()[0],
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "frames": args.frames,
+        "seed": args.seed,
+        "cases": [],
+    }
+    approximations = [None] + args.approximation
+    slice_counts = [1] + args.slices
+    for (scenario, engine), num_boids, num_blocks, radius, approximation, slices, num_objects, world_size in \
+            itertools.product(runs, args.boids, args.blocks, args.radius, approximations, slice_counts, args.objects,
+                              args.world):
+        if scenario != "swarm-soccer":
+            if num_objects != args.objects[0]:
+                continue  # pure-swarm has no balls, run it once
+            num_objects = None
+        if approximation is not None and engine != "objects":
+            continue  # the NumPy engine has no approximate mode
+        if slices != 1 and (engine != "objects" or scenario != "pure-swarm"):
+            continue  # only pure-swarm's Boid objects are staggered
+        case = run_case(scenario, engine, num_boids, num_blocks, radius, args.frames, args.time_limit, args.seed,
+                        approximation, slices, num_objects, world_size, not args.no_lod)
+        results["cases"].append(case)
+        phases = " ".join(f"{name}={ms:.2f}ms" for name, ms in case["phase_ms"].items())
+        print(f"{format_case(case):<60} {case['steps_per_sec']:10.1f} steps/sec  "
+              f"{case['bytes_per_boid']:.0f} B/boid  {phases}")
+        if "flock_error" in case:
+            errors = " ".join(f"{force} mean={mean:.4f} max={worst:.4f}"
+                              for force, (mean, worst) in case["flock_error"].items())
+            print(f"{'':<60} error vs exact: {errors}")
+        if "steering_drift" in case:
+            mean, worst = case["steering_drift"]
+            print(f"{'':<60} steering drift mean={mean:.4f} max={worst:.4f}  polarization={case['polarization']:.3f}")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.baseline}:")
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
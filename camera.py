@@ -0,0 +1,130 @@
+import pygame
+
+# Zoom goes in steps of ZOOM_STEP: levels MIN_LEVEL to MAX_LEVEL give zooms
+# from 1/16 to 8. Sprites are scaled once per level and cached, so zooming
+# never scales a sprite per frame.
+ZOOM_STEP = 2 ** 0.5
+MIN_LEVEL = -8
+MAX_LEVEL = 6
+PAN_FRACTION = 0.1  # of the window, per arrow key press
+
+
+class Camera:
+    # Which part of the world the window shows: the world point (x, y) at
+    # the window's top-left corner and a zoom in window pixels per world
+    # unit. The world can be any size; the camera is moved and zoomed with
+    # the mouse wheel (zooming around the cursor), a right-button drag and
+    # the arrow keys. Its center is kept inside the world.
+    def __init__(self, width, height, world_width, world_height, x=0.0, y=0.0, level=0):
+        self.width = width  # window size in pixels
+        self.height = height
+        self.world_width = world_width
+        self.world_height = world_height
+        self.x = x
+        self.y = y
+        self.level = level
+        self.zoom = ZOOM_STEP ** level
+        self.panning = False  # right button held
+
+    def view(self):
+        # Everything that decides what the window shows, to compare frames
+        return (self.x, self.y, self.zoom, self.width, self.height)
+
+    def to_screen(self, point):
+        return pygame.Vector2((point[0] - self.x) * self.zoom, (point[1] - self.y) * self.zoom)
+
+    def to_world(self, point):
+        return pygame.Vector2(self.x + point[0] / self.zoom, self.y + point[1] / self.zoom)
+
+    def viewport(self, margin=0):
+        # The world rectangle in view as (left, top, right, bottom), grown by
+        # margin world units on every side
+        return (self.x - margin, self.y - margin,
+                self.x + self.width / self.zoom + margin, self.y + self.height / self.zoom + margin)
+
+    def resize(self, width, height):
+        self.width = width
+        self.height = height
+        self._clamp()
+
+    def pan(self, dx, dy):
+        # Move the view by (dx, dy) window pixels
+        self.x += dx / self.zoom
+        self.y += dy / self.zoom
+        self._clamp()
+
+    def center_on(self, x, y):
+        self.x = x - self.width / (2 * self.zoom)
+        self.y = y - self.height / (2 * self.zoom)
+        self._clamp()
+
+    def fit_world(self):
+        # Zoom out, a level at a time from zoom 1, until the whole world fits
+        # in the window, and center it
+        fit = min(self.width / self.world_width, self.height / self.world_height)
+        level = 0
+        while level > MIN_LEVEL and ZOOM_STEP ** level > fit * (1 + 1e-9):  # an exact fit counts despite rounding
+            level -= 1
+        self.level = level
+        self.zoom = ZOOM_STEP ** level
+        self.center_on(self.world_width / 2, self.world_height / 2)
+
+    def zoom_at(self, steps, screen_point):
+        # Zoom in (steps > 0) or out, keeping the world point under
+        # screen_point where it is
+        level = self.level + steps
+        if level < MIN_LEVEL:
+            level = MIN_LEVEL
+        elif level > MAX_LEVEL:
+            level = MAX_LEVEL
+        if level == self.level:
+            return
+        anchor = self.to_world(screen_point)
+        self.level = level
+        self.zoom = ZOOM_STEP ** level
+        self.x = anchor.x - screen_point[0] / self.zoom
+        self.y = anchor.y - screen_point[1] / self.zoom
+        self._clamp()
+
+    def _clamp(self):
+        half_width = self.width / (2 * self.zoom)
+        half_height = self.height / (2 * self.zoom)
+        center_x = self.x + half_width
+        center_y = self.y + half_height
+        if center_x < 0:
+            self.x = -half_width
+        elif center_x > self.world_width:
+            self.x = self.world_width - half_width
+        if center_y < 0:
+            self.y = -half_height
+        elif center_y > self.world_height:
+            self.y = self.world_height - half_height
+
+    def handle_event(self, event):
+        # True if the event moved the camera and should not be handled as a
+        # click or key press by anything else
+        if event.type == pygame.MOUSEWHEEL:
+            self.zoom_at(event.y, pygame.mouse.get_pos())
+            return True
+        if event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+            if event.button == 3:
+                self.panning = event.type == pygame.MOUSEBUTTONDOWN
+                return True
+            # pygame 2 also reports the wheel as buttons 4 and 5
+            return event.button in (4, 5)
+        if event.type == pygame.MOUSEMOTION and self.panning:
+            self.pan(-event.rel[0], -event.rel[1])
+            return True
+        if event.type == pygame.KEYDOWN:
+            if event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                self.pan((1 if event.key == pygame.K_RIGHT else -1) * self.width * PAN_FRACTION, 0)
+                return True
+            if event.key in (pygame.K_UP, pygame.K_DOWN):
+                self.pan(0, (1 if event.key == pygame.K_DOWN else -1) * self.height * PAN_FRACTION)
+                return True
+            if event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_MINUS):
+                self.zoom_at(-1 if event.key == pygame.K_MINUS else 1, (self.width / 2, self.height / 2))
+                return True
+        if event.type == pygame.VIDEORESIZE:
+            self.resize(event.w, event.h)  # not consumed: others may want it too
+        return False
@@ -0,0 +1,213 @@
+import math
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, chain
+
+
+class CellAggregates:
+    # Boids bucketed into square cells, with each cell's count and the sums
+    # of its boids' positions and velocities. That is all alignment and
+    # cohesion need, so cells can stand in for their boids (Barnes-Hut
+    # style) instead of being walked boid by boid. Within one row, the cells
+    # entirely inside the neighbor circle form a run whose sums come from
+    # the row's prefix sums, so the cost per boid grows with the number of
+    # rows rather than with the number of boids in range. A cell the circle
+    # cuts through is walked boid by boid, unless its center of mass is at
+    # least (1 - approximation) cell diagonals from the circle; then the
+    # whole cell counts if that center is within the radius, and not at all
+    # otherwise. approximation = 0 gives the exact sums and 1 approximates
+    # every cut cell. Rebuilt once per step.
+    #
+    # Only occupied cells are stored: per row, the occupied columns in order
+    # with prefix sums over them, found by bisection. Rebuilding then costs
+    # the same in a small window and a huge world, and empty cells are
+    # never visited.
+    def __init__(self):
+        self.cell_size = 1
+        self.cols = 1
+        self.rows = 1
+        self.members = {}  # per occupied cell (row * cols + col): its boids
+        # Per occupied row: its occupied columns in order, their
+        # [count, position_x, position_y, velocity_x, velocity_y] sums, and
+        # the prefix sums of those five over the columns
+        self.row_columns = {}
+        self.row_sums = {}
+        self.row_prefixes = {}
+
+    def rebuild(self, boids, cell_size, width, height):
+        # Boids outside the window (right after a resize) are clamped into
+        # the border cells, where they count as if they were inside them
+        self.cell_size = cell_size = max(1, cell_size)
+        self.cols = cols = int(width // cell_size) + 1
+        self.rows = int(height // cell_size) + 1
+        members = {}
+        sums = {}
+        for boid in boids:
+            position = boid.position
+            velocity = boid.velocity
+            i = self.index_of(position.x, position.y)
+            cell = sums.get(i)
+            if cell is None:
+                members[i] = [boid]
+                sums[i] = [1, position.x, position.y, velocity.x, velocity.y]
+                continue
+            members[i].append(boid)
+            cell[0] += 1
+            cell[1] += position.x
+            cell[2] += position.y
+            cell[3] += velocity.x
+            cell[4] += velocity.y
+        self.members = members
+
+        row_columns = {}
+        row_sums = {}
+        for i in sorted(sums):
+            row, col = divmod(i, cols)
+            if row not in row_columns:
+                row_columns[row] = []
+                row_sums[row] = []
+            row_columns[row].append(col)
+            row_sums[row].append(sums[i])
+        self.row_columns = row_columns
+        self.row_sums = row_sums
+        self.row_prefixes = {row: [list(accumulate(values, initial=0)) for values in zip(*cells)]
+                             for row, cells in row_sums.items()}
+
+    def index_of(self, x, y):
+        col = int(x // self.cell_size)
+        if col < 0:
+            col = 0
+        elif col >= self.cols:
+            col = self.cols - 1
+        row = int(y // self.cell_size)
+        if row < 0:
+            row = 0
+        elif row >= self.rows:
+            row = self.rows - 1
+        return row * self.cols + col
+
+    def neighbor_sums(self, boid, radius, approximation):
+        # (count, position_x, position_y, velocity_x, velocity_y) summed over
+        # the other boids within radius of boid, as described above
+        position = boid.position
+        px = position.x
+        py = position.y
+        size = self.cell_size
+        cols = self.cols
+        radius_squared = radius * radius
+        # How far from the circle a cut cell's center of mass must be
+        margin = (1 - approximation) * size * math.sqrt(2)
+        own = self.index_of(px, py)
+        members = self.members
+        row_columns = self.row_columns
+        total = 0
+        position_x = position_y = velocity_x = velocity_y = 0.0
+        # Cells added as a whole include boid itself
+        counted_self = False
+
+        row_start = max(0, int((py - radius) // size))
+        row_end = min(self.rows - 1, int((py + radius) // size))
+        for row in range(row_start, row_end + 1):
+            columns = row_columns.get(row)
+            if columns is None:
+                continue
+            top = row * size
+            # Vertical distances from boid to the row's nearest and farthest edge
+            near_y = top - py if py < top else (py - top - size if py > top + size else 0.0)
+            above = py - top
+            below = top + size - py
+            far_y = above if above > below else below
+            if near_y * near_y >= radius_squared:
+                continue
+
+            # Columns the circle touches in this row, as positions in columns
+            half_width = math.sqrt(radius_squared - near_y * near_y)
+            first = bisect_left(columns, int((px - half_width) // size))
+            last = bisect_right(columns, int((px + half_width) // size))
+
+            # Columns entirely inside the circle, added from the prefix sums
+            inside_first = inside_last = last
+            if far_y < radius:
+                half_width = math.sqrt(radius_squared - far_y * far_y)
+                run_first = bisect_right(columns, int((px - half_width) // size), first, last)
+                run_last = bisect_left(columns, math.ceil((px + half_width) / size) - 1, run_first, last)
+                if run_first < run_last:
+                    inside_first = run_first
+                    inside_last = run_last
+                    prefix_count, prefix_position_x, prefix_position_y, prefix_velocity_x, prefix_velocity_y = \
+                        self.row_prefixes[row]
+                    total += prefix_count[run_last] - prefix_count[run_first]
+                    position_x += prefix_position_x[run_last] - prefix_position_x[run_first]
+                    position_y += prefix_position_y[run_last] - prefix_position_y[run_first]
+                    velocity_x += prefix_velocity_x[run_last] - prefix_velocity_x[run_first]
+                    velocity_y += prefix_velocity_y[run_last] - prefix_velocity_y[run_first]
+                    if row * cols + columns[run_first] <= own <= row * cols + columns[run_last - 1]:
+                        counted_self = True
+
+            # The cells the circle cuts, on either side of the run
+            base = row * cols
+            cells = self.row_sums[row]
+            for j in chain(range(first, inside_first), range(inside_last, last)):
+                i = base + columns[j]
+                n, cell_x, cell_y, cell_velocity_x, cell_velocity_y = cells[j]
+                if approximation > 0:
+                    dx = cell_x / n - px
+                    dy = cell_y / n - py
+                    distance = math.sqrt(dx * dx + dy * dy)
+                    if distance >= radius + margin:
+                        continue  # counted as entirely outside
+                    if distance <= radius - margin:
+                        # counted as entirely inside
+                        total += n
+                        position_x += cell_x
+                        position_y += cell_y
+                        velocity_x += cell_velocity_x
+                        velocity_y += cell_velocity_y
+                        if i == own:
+                            counted_self = True
+                        continue
+                for other in members[i]:
+                    if other is boid:
+                        continue
+                    other_position = other.position
+                    dx = px - other_position.x
+                    dy = py - other_position.y
+                    if dx * dx + dy * dy < radius_squared:
+                        other_velocity = other.velocity
+                        total += 1
+                        position_x += other_position.x
+                        position_y += other_position.y
+                        velocity_x += other_velocity.x
+                        velocity_y += other_velocity.y
+
+        if counted_self:
+            total -= 1
+            position_x -= px
+            position_y -= py
+            velocity_x -= boid.velocity.x
+            velocity_y -= boid.velocity.y
+        return total, position_x, position_y, velocity_x, velocity_y
+
+    def near(self, position, radius):
+        # The cells touched by the circle, as lists of boids, for exact
+        # pairwise checks within small radii (separation)
+        size = self.cell_size
+        col_start = max(0, int((position.x - radius) // size))
+        col_end = min(self.cols - 1, int((position.x + radius) // size))
+        row_start = max(0, int((position.y - radius) // size))
+        row_end = min(self.rows - 1, int((position.y + radius) // size))
+        members = self.members
+        cells = []
+        for row in range(row_start, row_end + 1):
+            columns = self.row_columns.get(row)
+            if columns is None:
+                continue
+            base = row * self.cols
+            for j in range(bisect_left(columns, col_start), bisect_right(columns, col_end)):
+                cells.append(members[base + columns[j]])
+        return cells
+
+
+def cell_size_for(radius):
+    # Eight cells across the radius: the cells the circle cuts are a thin
+    # band, and everything inside comes from the prefix sums
+    return max(1, math.ceil(radius / 8))
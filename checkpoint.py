@@ -0,0 +1,271 @@
+import json
+import math
+import struct
+import sys
+from array import array
+from collections import deque
+from itertools import chain
+from operator import attrgetter
+
+import pygame
+
+from demos import load_demo
+
+# A checkpoint is the whole state of a Simulation between two steps:
+#   header: magic, version, length of the metadata
+#   metadata (JSON): demo, World settings and clock, random state,
+#       simulation counters, and the name, type code and length of every
+#       array that follows
+#   arrays: one per field of the boids, objects and blocks (and the
+#       neighbor list anchors), little-endian, one value per agent
+# Restoring one gives a simulation that carries on exactly like the saved
+# one would have, so a long run can be stopped and resumed or forked into
+# any number of variants.
+MAGIC = b"SWCK"
+VERSION = 1
+HEADER = struct.Struct("<4sII")
+
+# How each attribute is stored:
+VECTOR = "vector"  # pygame.Vector2: x and y doubles
+MAYBE_VECTOR = "maybe vector"  # a Vector2 or () (no goal yet): NaN for ()
+NUMBER = "number"  # double
+MAYBE_NUMBER = "maybe number"  # double, NaN for None
+FLAG = "flag"  # byte
+COLOR = "color"  # three bytes
+
+# Every slot of the agent classes, in both demos
+FIELDS = {
+    "boids": {
+        "position": VECTOR, "previous_position": VECTOR, "velocity": VECTOR, "acceleration": VECTOR,
+        "steering": VECTOR, "color": COLOR, "signal_time": NUMBER, "goal_location": MAYBE_VECTOR,
+        "has_received": FLAG,
+    },
+    "objects": {
+        "position": VECTOR, "previous_position": VECTOR, "velocity": VECTOR, "size": NUMBER, "mass": NUMBER,
+        "is_dragging": FLAG, "held_in_goal": FLAG, "last_goal_time": MAYBE_NUMBER,
+        "object_remains_in_goal_time": MAYBE_NUMBER, "left_in_goal": FLAG,
+    },
+    "blocks": {"position": VECTOR, "color": COLOR, "size": NUMBER},
+}
+
+get_x = attrgetter("x")
+get_y = attrgetter("y")
+
+# The NumPy engine's arrays (SwarmState), saved as they are
+SWARM_ARRAYS = {
+    "positions": "d", "previous_positions": "d", "velocities": "d", "accelerations": "d",
+    "colors": "B", "signal_times": "q", "received": "B",
+}
+
+# Simulation attributes that are part of its state
+SIMULATION = ["frames", "one_second_ticker", "target_radius"]
+
+
+def demo_name(sim):
+    # "swarm-soccer" for a swarm_soccer.Simulation, as in demos.DEMOS
+    return type(sim).__module__.replace("_", "-")
+
+
+def slots(cls):
+    # Every __slots__ entry of cls and its base classes
+    names = []
+    for klass in reversed(cls.__mro__):
+        for name in klass.__dict__.get("__slots__", ()):
+            names.append(name)
+    return names
+
+
+def pack_items(group, items, arrays):
+    # Append the arrays of one group of agents (all of the same class)
+    if not items:
+        return
+    cls = type(items[0])
+    fields = FIELDS[group]
+    missing = [name for name in slots(cls) if name not in fields]
+    if missing:
+        raise ValueError(f"don't know how to save {cls.__name__}.{', '.join(missing)}")
+    for name in slots(cls):
+        kind = fields[name]
+        values = list(map(attrgetter(name), items))
+        if kind == VECTOR:
+            arrays.append((f"{group}.{name}.x", array("d", map(get_x, values))))
+            arrays.append((f"{group}.{name}.y", array("d", map(get_y, values))))
+        elif kind == MAYBE_VECTOR:
+            arrays.append((f"{group}.{name}.x", array("d", [value.x if value else math.nan for value in values])))
+            arrays.append((f"{group}.{name}.y", array("d", [value.y if value else math.nan for value in values])))
+        elif kind == NUMBER:
+            arrays.append((f"{group}.{name}", array("d", values)))
+        elif kind == MAYBE_NUMBER:
+            arrays.append((f"{group}.{name}", array("d", [math.nan if value is None else value for value in values])))
+        elif kind == FLAG:
+            arrays.append((f"{group}.{name}", array("B", values)))
+        elif kind == COLOR:
+            arrays.append((f"{group}.{name}", array("B", chain.from_iterable(values))))
+
+
+def unpack_items(group, cls, count, arrays):
+    # count new instances of cls, without running __init__, from the arrays
+    items = [cls.__new__(cls) for _ in range(count)]
+    if not count:
+        return items
+    fields = FIELDS[group]
+    Vector2 = pygame.Vector2
+    for name in slots(cls):
+        kind = fields[name]
+        if kind in (VECTOR, MAYBE_VECTOR):
+            xs = arrays[f"{group}.{name}.x"]
+            ys = arrays[f"{group}.{name}.y"]
+            if kind == VECTOR:
+                values = list(map(Vector2, xs, ys))
+            else:
+                values = [() if x != x else Vector2(x, y) for x, y in zip(xs, ys)]
+        elif kind == NUMBER:
+            values = arrays[f"{group}.{name}"]
+        elif kind == MAYBE_NUMBER:
+            values = [None if value != value else value for value in arrays[f"{group}.{name}"]]
+        elif kind == FLAG:
+            values = list(map(bool, arrays[f"{group}.{name}"]))
+        elif kind == COLOR:
+            colors = arrays[f"{group}.{name}"]
+            values = list(zip(colors[0::3], colors[1::3], colors[2::3]))
+        # Through the slot's descriptor, looped over in C
+        deque(map(cls.__dict__[name].__set__, items, values), maxlen=0)
+    return items
+
+
+def pack_swarm(swarm, arrays):
+    # The used rows of a SwarmState's arrays, one memory copy each
+    for name, typecode in SWARM_ARRAYS.items():
+        arrays.append((f"swarm.{name}", array(typecode, getattr(swarm, name)[:swarm.count].tobytes())))
+
+
+def unpack_swarm(demo, count, arrays):
+    # A SwarmState with the saved rows
+    if demo.SwarmState is None:
+        raise ValueError("this checkpoint is of the NumPy engine, which needs NumPy")
+    from swarm_state import BoidView
+    swarm = demo.SwarmState(demo.Boid.draw, capacity=max(count, 64))
+    for name in SWARM_ARRAYS:
+        # A flat view of the rows, filled straight from the array's buffer
+        getattr(swarm, name)[:count].reshape(-1)[:] = arrays[f"swarm.{name}"]
+    swarm.count = count
+    swarm.views = [BoidView(swarm, i) for i in range(count)]
+    return swarm
+
+
+def dumps(sim):
+    # The checkpoint of sim as bytes
+    world = sim.world
+    boids = sim.boids
+    objects = getattr(sim, "objects", [])
+
+    arrays = []
+    engine = "objects" if isinstance(boids, list) else "numpy"
+    if engine == "numpy":
+        pack_swarm(boids, arrays)
+    else:
+        pack_items("boids", boids, arrays)
+    pack_items("objects", objects, arrays)
+    pack_items("blocks", sim.blocks, arrays)
+
+    # The neighbor lists are saved by their anchors: rebuilt from those they
+    # come out the same, down to the order of the boids in them
+    neighbor_list = world.neighbor_list
+    anchors = neighbor_list.anchors
+    if len(anchors) == len(boids) and all(anchor[0] is boid for anchor, boid in zip(anchors, boids)):
+        arrays.append(("neighbor_list.x", array("d", [anchor[1] for anchor in anchors])))
+        arrays.append(("neighbor_list.y", array("d", [anchor[2] for anchor in anchors])))
+        neighbor_state = {"radius": neighbor_list.radius, "skin": neighbor_list.skin}
+    else:
+        neighbor_state = None  # out of date, rebuilt on the next step anyway
+
+    settings = {}
+    for name in slots(type(world)):
+        value = getattr(world, name)
+        if value is None or isinstance(value, (bool, int, float)):
+            settings[name] = value
+    simulation = {name: getattr(sim, name) for name in SIMULATION if hasattr(sim, name)}
+    simulation["target_position"] = [sim.target_position.x, sim.target_position.y]
+    simulation["accumulator"] = sim.timestep.accumulator
+
+    metadata = {
+        "demo": demo_name(sim),
+        "engine": engine,
+        "settings": settings,
+        "random": world.rng.getstate(),
+        "simulation": simulation,
+        "counts": {"boids": len(boids), "objects": len(objects), "blocks": len(sim.blocks)},
+        "neighbor_list": neighbor_state,
+        "arrays": [(name, values.typecode, len(values)) for name, values in arrays],
+    }
+    header = json.dumps(metadata).encode()
+    chunks = [HEADER.pack(MAGIC, VERSION, len(header)), header]
+    for name, values in arrays:
+        if sys.byteorder == "big":
+            values.byteswap()
+        chunks.append(values.tobytes())
+    return b"".join(chunks)
+
+
+def loads(data):
+    # A new Simulation from checkpoint bytes
+    magic, version, size = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a checkpoint")
+    if version != VERSION:
+        raise ValueError(f"checkpoint version {version}, expected {VERSION}")
+    metadata = json.loads(data[HEADER.size:HEADER.size + size])
+    offset = HEADER.size + size
+    arrays = {}
+    for name, typecode, length in metadata["arrays"]:
+        values = array(typecode)
+        end = offset + length * values.itemsize
+        values.frombytes(data[offset:end])
+        if sys.byteorder == "big":
+            values.byteswap()
+        arrays[name] = values
+        offset = end
+
+    demo = load_demo(metadata["demo"])
+    world = demo.default_world()
+    for name, value in metadata["settings"].items():
+        setattr(world, name, value)
+    sim = demo.Simulation(num_boids=0, world=world)
+    for name, value in metadata["simulation"].items():
+        if name == "target_position":
+            sim.target_position = pygame.Vector2(value)
+        elif name == "accumulator":
+            sim.timestep.accumulator = value
+        else:
+            setattr(sim, name, value)
+
+    counts = metadata["counts"]
+    if metadata["engine"] == "numpy":
+        sim.boids = unpack_swarm(demo, counts["boids"], arrays)
+    else:
+        sim.boids[:] = unpack_items("boids", demo.Boid, counts["boids"], arrays)
+    if hasattr(sim, "objects"):
+        sim.objects[:] = unpack_items("objects", demo.MovableObject, counts["objects"], arrays)
+    # The soccer demo has no Block class; its blocks are pure-swarm's
+    block_class = getattr(demo, "Block", None) or load_demo("pure-swarm").Block
+    sim.blocks[:] = unpack_items("blocks", block_class, counts["blocks"], arrays)
+
+    neighbor_state = metadata["neighbor_list"]
+    if neighbor_state is not None:
+        anchors = list(zip(sim.boids, arrays["neighbor_list.x"], arrays["neighbor_list.y"]))
+        world.neighbor_list.build(anchors, neighbor_state["radius"], neighbor_state["skin"])
+
+    # Last, as building the Simulation above drew from it
+    version, state, gauss = metadata["random"]
+    world.rng.setstate((version, tuple(state), gauss))
+    return sim
+
+
+def save(sim, path):
+    with open(path, "wb") as f:
+        f.write(dumps(sim))
+
+
+def load(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
@@ -0,0 +1,27 @@
+import importlib.util
+import os
+import sys
+
+# The demo scripts, by the name used on the command line and in checkpoints
+DEMOS = {
+    "pure-swarm": "pure-swarm.py",
+    "swarm-soccer": "swarm-soccer.py",
+}
+
+
+def load_demo(name):
+    # The demo scripts have dashes in their file names, so they are imported
+    # by path. SDL is pointed at the dummy video driver first, so nothing
+    # needs a real display.
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    filename = DEMOS.get(name, name)
+    module_name = os.path.splitext(os.path.basename(filename))[0].replace("-", "_")
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
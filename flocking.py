@@ -0,0 +1,142 @@
+import math
+
+import pygame
+
+
+def steer(x, y, velocity, max_speed, max_force):
+    # (x, y) normalized, times max_speed, minus velocity and limited to
+    # max_force, as a tuple. A zero direction gives no steering.
+    length = math.hypot(x, y)
+    if length == 0:
+        return 0.0, 0.0
+    x = x / length * max_speed - velocity.x
+    y = y / length * max_speed - velocity.y
+    length = math.hypot(x, y)
+    if length > max_force:
+        x *= max_force / length
+        y *= max_force / length
+    return x, y
+
+
+def flock_steering(boid, neighbors, obstacles, neighbor_radius, separation_radius,
+                   max_speed, max_force):
+    # Alignment, cohesion and separation in a single pass over the candidate
+    # neighbors, as one flat tuple (ax, ay, cx, cy, sx, sy). Only floats and
+    # vector components are used, so the neighbor loop creates no
+    # pygame.Vector2 (each Vector2 method call costs an allocation). Gives
+    # the same forces as calling Boid.align, Boid.cohesion and
+    # Boid.separation one after another. obstacles is an ObstacleMap, synced
+    # with the blocks for the current separation radius.
+    position = boid.position
+    velocity = boid.velocity
+    px = position.x
+    py = position.y
+    neighbor_squared = neighbor_radius * neighbor_radius
+    separation_squared = separation_radius * separation_radius
+    reach_squared = neighbor_squared if neighbor_squared > separation_squared else separation_squared
+
+    velocity_x = velocity_y = 0.0
+    position_x = position_y = 0.0
+    away_x = away_y = 0.0
+    total = 0
+    away_total = 0
+
+    for other in neighbors:
+        if other is boid:
+            continue
+        other_position = other.position
+        dx = px - other_position.x
+        dy = py - other_position.y
+        distance_squared = dx * dx + dy * dy
+        if distance_squared >= reach_squared:
+            continue  # most candidates from the grid cells are out of range
+        if distance_squared < neighbor_squared:
+            other_velocity = other.velocity
+            velocity_x += other_velocity.x
+            velocity_y += other_velocity.y
+            position_x += other_position.x
+            position_y += other_position.y
+            total += 1
+        if distance_squared < separation_squared:
+            if distance_squared != 0:
+                distance = math.sqrt(distance_squared)
+                dx /= distance
+                dy /= distance
+            away_x += dx
+            away_y += dy
+            away_total += 1
+
+    return combine(boid, obstacles, max_speed, max_force, total, position_x, position_y, velocity_x, velocity_y,
+                   away_total, away_x, away_y)
+
+
+def approximate_flock_steering(boid, aggregates, obstacles, neighbor_radius, separation_radius,
+                               max_speed, max_force, approximation):
+    # flock_steering() with alignment and cohesion from the per-cell sums of
+    # a CellAggregates (approximation trades accuracy for speed, see there).
+    # Separation is still exact, from the boids in the cells near boid.
+    total, position_x, position_y, velocity_x, velocity_y = aggregates.neighbor_sums(boid, neighbor_radius,
+                                                                                          approximation)
+
+    position = boid.position
+    px = position.x
+    py = position.y
+    separation_squared = separation_radius * separation_radius
+    away_x = away_y = 0.0
+    away_total = 0
+    for cell in aggregates.near(position, separation_radius):
+        for other in cell:
+            if other is boid:
+                continue
+            other_position = other.position
+            dx = px - other_position.x
+            dy = py - other_position.y
+            distance_squared = dx * dx + dy * dy
+            if distance_squared < separation_squared:
+                if distance_squared != 0:
+                    distance = math.sqrt(distance_squared)
+                    dx /= distance
+                    dy /= distance
+                away_x += dx
+                away_y += dy
+                away_total += 1
+
+    return combine(boid, obstacles, max_speed, max_force, total, position_x, position_y, velocity_x, velocity_y,
+                   away_total, away_x, away_y)
+
+
+def combine(boid, obstacles, max_speed, max_force, total, position_x, position_y, velocity_x, velocity_y,
+            away_total, away_x, away_y):
+    # The three steering forces from the neighbor sums: total boids within
+    # the neighbor radius with their summed positions and velocities, and
+    # away_total boids within the separation radius with their summed unit
+    # vectors away from boid. Blocks are added from the obstacle map.
+    position = boid.position
+    velocity = boid.velocity
+    block_x, block_y, count = obstacles.repulsion(position)
+    if count:
+        away_x += block_x
+        away_y += block_y
+        away_total += count
+
+    alignment_x = alignment_y = cohesion_x = cohesion_y = 0.0
+    if total > 0:
+        alignment_x, alignment_y = steer(velocity_x / total, velocity_y / total, velocity, max_speed, max_force)
+        cohesion_x, cohesion_y = steer(position_x / total - position.x, position_y / total - position.y,
+                                       velocity, max_speed, max_force)
+
+    if away_total > 0:
+        away_x /= away_total
+        away_y /= away_total
+    separation_x, separation_y = steer(away_x, away_y, velocity, max_speed, max_force)
+
+    return alignment_x, alignment_y, cohesion_x, cohesion_y, separation_x, separation_y
+
+
+def flock_forces(boid, neighbors, obstacles, neighbor_radius, separation_radius,
+                 max_speed, max_force):
+    # flock_steering() as three pygame.Vector2 (alignment, cohesion,
+    # separation), for callers that want vectors rather than components
+    ax, ay, cx, cy, sx, sy = flock_steering(boid, neighbors, obstacles, neighbor_radius, separation_radius,
+                                            max_speed, max_force)
+    return pygame.Vector2(ax, ay), pygame.Vector2(cx, cy), pygame.Vector2(sx, sy)
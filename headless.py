@@ -0,0 +1,109 @@
+import argparse
+import time
+
+import checkpoint
+from demos import DEMOS, load_demo
+from telemetry import TelemetryWriter, sample
+from trajectory import TrajectoryRecorder
+
+
+def run(sim, steps, dt=1000 / 30, max_fps=None, recorder=None, telemetry=None):
+    # Step the simulation without drawing. Runs as fast as the CPU allows
+    # unless max_fps is given. With a TrajectoryRecorder, every step is
+    # recorded; with a TelemetryWriter, steps are sampled (frame_ms is the
+    # wall time of the step). Returns the achieved steps per second.
+    frame_time = 1.0 / max_fps if max_fps else 0
+    start = time.perf_counter()
+    next_frame = start
+    for _ in range(steps):
+        step_start = time.perf_counter()
+        sim.step(dt)
+        if recorder is not None:
+            recorder.record(sim)
+        if telemetry is not None and telemetry.due():
+            telemetry.submit(sample(sim, (time.perf_counter() - step_start) * 1000))
+        if frame_time:
+            next_frame += frame_time
+            delay = next_frame - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    elapsed = time.perf_counter() - start
+    sim.profiler.end_frame()
+    return steps / elapsed if elapsed > 0 else float("inf")
+
+
+def run_batch(sims, steps, dt=1000 / 30):
+    # Step independent simulations side by side in this process, each for
+    # `steps` steps. Returns the total steps per second over all of them.
+    start = time.perf_counter()
+    for _ in range(steps):
+        for sim in sims:
+            sim.step(dt)
+    elapsed = time.perf_counter() - start
+    for sim in sims:
+        sim.profiler.end_frame()
+    total = steps * len(sims)
+    return total / elapsed if elapsed > 0 else float("inf")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a swarm demo without a window.")
+    parser.add_argument("demo", choices=sorted(DEMOS), help="which simulation to run")
+    parser.add_argument("--steps", type=int, default=1000, help="number of steps to simulate")
+    parser.add_argument("--boids", type=int, default=100, help="number of boids")
+    parser.add_argument("--dt", type=float, default=1000 / 30, help="simulated milliseconds per step")
+    parser.add_argument("--max-fps", type=float, default=None, help="cap the step rate (default: uncapped)")
+    parser.add_argument("--worlds", type=int, default=1, help="independent simulations to step side by side")
+    parser.add_argument("--seed", type=int, default=None, help="seed for a reproducible run (world i gets seed + i)")
+    parser.add_argument("--record", help="record every step to this trajectory file (see replay.py)")
+    parser.add_argument("--telemetry", help="log per-step metrics to this .jsonl or .csv file")
+    parser.add_argument("--telemetry-every", type=int, default=1, help="sample one in this many steps")
+    parser.add_argument("--resume", help="start from this checkpoint instead of a new swarm (--boids is ignored)")
+    parser.add_argument("--checkpoint", help="save the simulation to this checkpoint file at the end")
+    args = parser.parse_args()
+
+    demo = load_demo(args.demo)
+
+    def make_sim(i):
+        world = demo.default_world()
+        if args.seed is not None:
+            world.rng.seed(args.seed + i)
+        return demo.Simulation(num_boids=args.boids, world=world)
+
+    if args.worlds > 1:
+        if args.record or args.resume or args.checkpoint or args.telemetry:
+            parser.error("--record, --telemetry, --resume and --checkpoint need a single world")
+        sims = [make_sim(i) for i in range(args.worlds)]
+        rate = run_batch(sims, args.steps, args.dt)
+        print(f"{args.demo}: {args.worlds} worlds x {args.steps} steps with {args.boids} boids each "
+              f"at {rate:.1f} steps/sec in total")
+        return
+    if args.resume:
+        sim = checkpoint.load(args.resume)
+        if checkpoint.demo_name(sim) != args.demo:
+            parser.error(f"{args.resume} is a checkpoint of {checkpoint.demo_name(sim)}")
+        if args.seed is not None:
+            sim.world.rng.seed(args.seed)  # a variant of the saved run
+    else:
+        sim = make_sim(0)
+    recorder = TrajectoryRecorder(args.record, sim.world) if args.record else None
+    telemetry = TelemetryWriter(args.telemetry, every=args.telemetry_every) if args.telemetry else None
+    rate = run(sim, args.steps, args.dt, args.max_fps, recorder, telemetry)
+    if recorder is not None:
+        recorder.close()
+        print(f"Recorded {recorder.records} steps to {args.record}")
+    if telemetry is not None:
+        telemetry.close()
+        print(f"Wrote {telemetry.written} samples to {args.telemetry} ({telemetry.dropped} dropped)")
+        if telemetry.error is not None:
+            print(f"Telemetry stopped writing: {telemetry.error}")
+    if args.checkpoint:
+        checkpoint.save(sim, args.checkpoint)
+        print(f"Saved a checkpoint at {sim.world.sim_time / 1000:.1f} s to {args.checkpoint}")
+    print(f"{args.demo}: {args.steps} steps with {len(sim.boids)} boids at {rate:.1f} steps/sec")
+    for name, stats in sim.profiler.stats().items():
+        print(f"  {name:<12} avg {stats['avg']:7.2f} ms  p95 {stats['p95']:7.2f} ms  max {stats['max']:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
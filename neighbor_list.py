@@ -0,0 +1,88 @@
+class NeighborList:
+    # Verlet neighbor lists: for every boid, the boids that were within
+    # radius + skin of it when the lists were built. While no boid has moved
+    # more than skin / 2 since then, every pair that is within radius now
+    # was within radius + skin then, so the lists can be reused for many
+    # steps; callers still do their own exact distance check, as with
+    # SpatialGrid.query. Boids outside the window are fine: cells aren't
+    # clamped to it. The lists are rebuilt when a boid moved further,
+    # the radius or skin changed (e.g. from the UI) or boids were added or
+    # removed. A bigger skin means fewer rebuilds but longer lists.
+    def __init__(self):
+        self.radius = None  # radius and skin the lists were built for
+        self.skin = None
+        self.lists = {}  # boid -> boids within radius + skin at the last build
+        self.anchors = []  # (boid, x, y) for every boid at the last build
+        self.builds = 0  # how many times the lists were built
+
+    def needs_rebuild(self, boids, radius, skin):
+        if radius != self.radius or skin != self.skin or len(boids) != len(self.anchors):
+            return True
+        limit = self.skin * self.skin / 4  # (skin / 2) squared
+        for boid, (anchor, x, y) in zip(boids, self.anchors):
+            if boid is not anchor:
+                return True
+            position = boid.position
+            dx = position.x - x
+            dy = position.y - y
+            if dx * dx + dy * dy > limit:
+                return True
+        return False
+
+    def update(self, boids, radius, skin):
+        # Rebuilds the lists if needed. Returns True if it did.
+        if not self.needs_rebuild(boids, radius, skin):
+            return False
+        self.build([(boid, boid.position.x, boid.position.y) for boid in boids], radius, skin)
+        return True
+
+    def build(self, anchors, radius, skin):
+        # The lists for boids at the given (boid, x, y) anchors. Restoring a
+        # checkpoint builds them from the saved anchors, to get the same
+        # lists in the same order as before.
+        reach = radius + skin
+        reach_squared = reach * reach
+
+        # Bucket the boids into cells of the list radius, then test every
+        # pair once: within a cell, and against the cells to the right and
+        # below (half of the 3x3 block around it), adding each close pair to
+        # both lists
+        cells = {}
+        for anchor in anchors:
+            key = (int(anchor[1] // reach), int(anchor[2] // reach))
+            bucket = cells.get(key)
+            if bucket is None:
+                cells[key] = [anchor]
+            else:
+                bucket.append(anchor)
+        lists = {boid: [] for boid, x, y in anchors}
+        for (col, row), bucket in cells.items():
+            for i, (boid, x, y) in enumerate(bucket):
+                near = lists[boid]
+                for other, other_x, other_y in bucket[i + 1:]:
+                    dx = x - other_x
+                    dy = y - other_y
+                    if dx * dx + dy * dy < reach_squared:
+                        near.append(other)
+                        lists[other].append(boid)
+            for key in ((col + 1, row - 1), (col + 1, row), (col + 1, row + 1), (col, row + 1)):
+                others = cells.get(key)
+                if not others:
+                    continue
+                for boid, x, y in bucket:
+                    near = lists[boid]
+                    for other, other_x, other_y in others:
+                        dx = x - other_x
+                        dy = y - other_y
+                        if dx * dx + dy * dy < reach_squared:
+                            near.append(other)
+                            lists[other].append(boid)
+        self.lists = lists
+        self.anchors = anchors
+        self.radius = radius
+        self.skin = skin
+        self.builds += 1
+
+    def get(self, boid):
+        # The candidates for boid, or None if it wasn't there at the last build
+        return self.lists.get(boid)
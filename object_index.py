@@ -0,0 +1,51 @@
+from spatial_grid import SpatialGrid
+
+
+class ObjectIndex:
+    # MovableObjects bucketed in a SpatialGrid, so a boid only looks at the
+    # objects near it instead of every object. Objects boids may go for are
+    # also kept in a second grid of their own (targets), for nearest().
+    # Rebuilt once per step, before the boids move, like the boid grid.
+    def __init__(self):
+        self.objects = SpatialGrid(1)
+        self.targets = SpatialGrid(1)
+        self.largest_size = 0  # radius of the biggest object, for collision queries
+        self.top_speed = 0  # of the fastest object, for how far objects can be from their cells
+
+    def rebuild(self, objects, targets, cell_size, width, height):
+        self.objects.rebuild(objects, cell_size, width, height)
+        self.targets.rebuild(targets, cell_size, width, height)
+        self.largest_size = 0
+        self.top_speed = 0
+        for obj in objects:
+            if obj.size > self.largest_size:
+                self.largest_size = obj.size
+            speed = obj.velocity.x * obj.velocity.x + obj.velocity.y * obj.velocity.y
+            if speed > self.top_speed:
+                self.top_speed = speed
+        self.top_speed **= 0.5
+
+    def near(self, position, radius):
+        # Every object in the cells touched by the circle; as with
+        # SpatialGrid.query, callers do their own exact distance check and
+        # must not modify the list
+        return self.objects.query(position, radius)
+
+    def in_rect(self, left, top, right, bottom):
+        # Every object in the cells touched by the rectangle
+        return self.objects.query_rect(left, top, right, bottom)
+
+    def nearest(self, position, radius):
+        # The closest target less than radius away, or None
+        closest = None
+        closest_squared = radius * radius
+        x = position.x
+        y = position.y
+        for obj in self.targets.query(position, radius):
+            dx = obj.position.x - x
+            dy = obj.position.y - y
+            distance_squared = dx * dx + dy * dy
+            if distance_squared < closest_squared:
+                closest_squared = distance_squared
+                closest = obj
+        return closest
@@ -0,0 +1,126 @@
+import math
+
+import pygame
+
+
+class ObstacleMap:
+    # Blocks rasterized into a window-sized pygame.Mask (for bouncing) and a
+    # coarse repulsion field (for separation). For every field cell the field
+    # holds the sum of the unit vectors pointing away from each block within
+    # the separation radius of the cell's center, and the number of those
+    # blocks; that is what Boid.separation() used to add up block by block.
+    # Both lookups cost the same however many blocks there are.
+    #
+    # sync() takes new blocks from the simulation's list incrementally and
+    # rebuilds everything when the window size, the radius or the list
+    # changed. A block at the same position as one already indexed is
+    # ignored.
+    def __init__(self, boid_size=5, field_cell=10):
+        self.boid_size = boid_size
+        self.field_cell = field_cell
+        self.boid_mask = pygame.Mask((boid_size, boid_size), fill=True)
+        self.column_mask = pygame.Mask((1, boid_size), fill=True)
+        self.row_mask = pygame.Mask((boid_size, 1), fill=True)
+        self.block_masks = {}  # block size -> filled mask
+        self.source = None  # the block list being indexed
+        self.synced = 0  # how many blocks of the list were looked at
+        self._reset(0, 0, 0)
+
+    def _reset(self, width, height, radius):
+        self.width = width
+        self.height = height
+        self.radius = radius
+        self.positions = set()
+        self.mask = pygame.Mask((max(1, int(width)), max(1, int(height))))
+        self.cols = int(width // self.field_cell) + 1
+        self.rows = int(height // self.field_cell) + 1
+        self.field_x = [0.0] * (self.cols * self.rows)
+        self.field_y = [0.0] * (self.cols * self.rows)
+        self.field_count = [0] * (self.cols * self.rows)
+        self.synced = 0
+
+    def __len__(self):
+        return len(self.positions)
+
+    def sync(self, blocks, width, height, radius):
+        if (blocks is not self.source or len(blocks) < self.synced
+                or width != self.width or height != self.height or radius != self.radius):
+            self._reset(width, height, radius)
+            self.source = blocks
+        if len(blocks) > self.synced:
+            for block in blocks[self.synced:]:
+                self.add(block)
+            self.synced = len(blocks)
+
+    def contains(self, x, y):
+        return (x, y) in self.positions
+
+    def add(self, block):
+        # Returns False if a block at that position is already indexed
+        key = (block.position.x, block.position.y)
+        if key in self.positions:
+            return False
+        self.positions.add(key)
+
+        rect = block.get_rect()
+        block_mask = self.block_masks.get(rect.size)
+        if block_mask is None:
+            block_mask = self.block_masks[rect.size] = pygame.Mask(rect.size, fill=True)
+        self.mask.draw(block_mask, rect.topleft)
+
+        # Add this block's push to every cell whose center is within radius
+        bx, by = block.position
+        cell = self.field_cell
+        radius = self.radius
+        col_start = max(0, int((bx - radius) // cell))
+        col_end = min(self.cols - 1, int((bx + radius) // cell))
+        row_start = max(0, int((by - radius) // cell))
+        row_end = min(self.rows - 1, int((by + radius) // cell))
+        field_x, field_y, field_count = self.field_x, self.field_y, self.field_count
+        for row in range(row_start, row_end + 1):
+            dy = (row + 0.5) * cell - by
+            base = row * self.cols
+            for col in range(col_start, col_end + 1):
+                dx = (col + 0.5) * cell - bx
+                distance = math.hypot(dx, dy)
+                if distance < radius:
+                    i = base + col
+                    if distance != 0:
+                        field_x[i] += dx / distance
+                        field_y[i] += dy / distance
+                    field_count[i] += 1
+        return True
+
+    def repulsion(self, position):
+        # (x, y, count): summed unit vectors away from the blocks within the
+        # separation radius of position, and how many blocks that is
+        if not self.positions:
+            return 0.0, 0.0, 0
+        col = min(self.cols - 1, max(0, int(position.x // self.field_cell)))
+        row = min(self.rows - 1, max(0, int(position.y // self.field_cell)))
+        i = row * self.cols + col
+        return self.field_x[i], self.field_y[i], self.field_count[i]
+
+    def bounce(self, position):
+        # (flip_x, flip_y) for a boid whose collision box has its top-left
+        # corner at position. A block the boid overlaps flips the vertical
+        # velocity if the boid's x is within the block's columns, and the
+        # horizontal velocity if its y is within the block's rows.
+        if not self.positions:
+            return False, False
+        # The box is placed like pygame.Rect(x, y, ...) would, truncated
+        x = position.x
+        y = position.y
+        box = (int(x), int(y))
+        if self.mask.overlap(self.boid_mask, box) is None:
+            return False, False
+        # The within-columns/rows tests are left <= x <= right (and the same
+        # for y) on the exact position: the column or row x falls in, and the
+        # one before it when x is exactly on a block's right edge
+        column = math.floor(x)
+        row = math.floor(y)
+        flip_x = self.mask.overlap(self.row_mask, (box[0], row)) is not None \
+            or (y == row and self.mask.overlap(self.row_mask, (box[0], row - 1)) is not None)
+        flip_y = self.mask.overlap(self.column_mask, (column, box[1])) is not None \
+            or (x == column and self.mask.overlap(self.column_mask, (column - 1, box[1])) is not None)
+        return flip_x, flip_y
@@ -0,0 +1,132 @@
+import time
+from collections import deque
+
+import pygame
+
+
+def percentile(samples, fraction):
+    # Nearest-rank percentile of a sequence of numbers
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+class PhaseTimer:
+    # Context manager returned by FrameProfiler.phase()
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class FrameProfiler:
+    # Keeps the time spent in each named phase for the last `history` frames.
+    # Simulation.step() starts a frame and times its own phases; main() adds
+    # drawing and UI on top. Everything is in milliseconds.
+    def __init__(self, history=120):
+        self.history = history
+        self.phases = {}  # phase name -> deque of ms per frame
+        self.frame_times = deque(maxlen=history)  # wall time between frames
+        self.work_times = deque(maxlen=history)  # time spent inside phases
+        self.frame_count = 0
+        self.current = None
+        self.frame_start = 0.0
+        self.font = None
+
+    def begin_frame(self):
+        now = time.perf_counter()
+        if self.current is not None:
+            self._commit(now)
+        self.current = {}
+        self.frame_start = now
+
+    def end_frame(self):
+        if self.current is not None:
+            self._commit(time.perf_counter())
+            self.current = None
+
+    def _commit(self, now):
+        self.frame_times.append((now - self.frame_start) * 1000)
+        self.work_times.append(sum(self.current.values()))
+        for name in self.current:
+            if name not in self.phases:
+                self.phases[name] = deque(maxlen=self.history)
+        for name, samples in self.phases.items():
+            samples.append(self.current.get(name, 0.0))
+        self.frame_count += 1
+
+    def phase(self, name):
+        return PhaseTimer(self, name)
+
+    def add(self, name, seconds):
+        if self.current is None:
+            self.begin_frame()
+        self.current[name] = self.current.get(name, 0.0) + seconds * 1000
+
+    def summary(self, samples):
+        if not samples:
+            return {"avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        return {
+            "avg": sum(samples) / len(samples),
+            "p50": percentile(samples, 0.5),
+            "p95": percentile(samples, 0.95),
+            "max": max(samples),
+        }
+
+    def stats(self):
+        # Rolling averages and percentiles for every phase, plus "frame" (wall
+        # time per frame) and "work" (time inside phases)
+        result = {name: self.summary(samples) for name, samples in self.phases.items()}
+        result["frame"] = self.summary(self.frame_times)
+        result["work"] = self.summary(self.work_times)
+        return result
+
+    def draw(self, screen):
+        # Overlay in the top-right corner: one line per phase and a bar graph
+        # of the work time of recent frames (the line marks 33 ms, 30 FPS).
+        if self.font is None:
+            self.font = pygame.font.SysFont(None, 15)
+        stats = self.stats()
+        width = 230
+        x = screen.get_width() - width - 10
+        y = 10
+
+        frame = stats["frame"]
+        fps = 1000 / frame["avg"] if frame["avg"] > 0 else 0
+        rows = [("phase", "avg", "p95", "max")]
+        for name in self.phases:
+            s = stats[name]
+            rows.append((name, f"{s['avg']:.2f}", f"{s['p95']:.2f}", f"{s['max']:.2f}"))
+        lines = 1 + len(rows)
+
+        graph_height = 50
+        panel = pygame.Surface((width, 16 * lines + graph_height + 10), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        header = f"frame {frame['avg']:.1f} ms ({fps:.0f} fps)  work {stats['work']['avg']:.1f} ms"
+        panel.blit(self.font.render(header, True, (255, 255, 255)), (5, 5))
+        for i, row in enumerate(rows):
+            for column, text in zip((5, 100, 145, 190), row):
+                panel.blit(self.font.render(text, True, (255, 255, 255)), (column, 21 + 16 * i))
+
+        graph_top = 10 + 16 * lines
+        scale = graph_height / 66.0  # 0..66 ms fills the graph
+        for i, ms in enumerate(list(self.work_times)[-(width - 10) // 2:]):
+            bar = min(graph_height, int(ms * scale))
+            color = (0, 200, 0) if ms <= 33.3 else (220, 60, 60)
+            pygame.draw.line(panel, color, (5 + 2 * i, graph_top + graph_height), (5 + 2 * i, graph_top + graph_height - bar))
+        budget_y = graph_top + graph_height - int(33.3 * scale)
+        pygame.draw.line(panel, (255, 255, 0), (5, budget_y), (width - 5, budget_y))
+
+        screen.blit(panel, (x, y))
@@ -0,0 +1,57 @@
+from collections import deque
+
+
+class BroadcastReport:
+    # What happened to one message: how many boids got it and how many
+    # relay hops the furthest one was from the sender
+    __slots__ = ("source", "goal_location", "reach", "hops")
+
+    def __init__(self, source, goal_location):
+        self.source = source
+        self.goal_location = goal_location
+        self.reach = 0
+        self.hops = 0
+
+
+class BroadcastQueue:
+    # Messages sent with Boid.broadcast() wait here until propagate() runs
+    # them once per frame. Each message spreads as a breadth-first wave:
+    # every boid within `radius` of a boid that has it receives it and passes
+    # it on. A boid receives at most one message per frame (has_received).
+    def __init__(self):
+        self.pending = []
+        self.reports = []  # reports from the last propagate()
+
+    def send(self, source, goal_location):
+        self.pending.append((source, goal_location))
+
+    def propagate(self, grid, radius, receive):
+        # grid is a SpatialGrid of the current boid positions. receive(boid,
+        # goal_location) is called for every boid the wave reaches.
+        reports = []
+        pending, self.pending = self.pending, []
+        radius_squared = radius * radius
+        for source, goal_location in pending:
+            report = BroadcastReport(source, goal_location)
+            wave = deque([(source, 0)])
+            while wave:
+                sender, hops = wave.popleft()
+                position = sender.position
+                x = position.x
+                y = position.y
+                for boid in grid.query(position, radius):
+                    if boid is sender or boid.has_received:
+                        continue
+                    other = boid.position
+                    dx = x - other.x
+                    dy = y - other.y
+                    if dx * dx + dy * dy >= radius_squared:
+                        continue
+                    boid.has_received = True
+                    receive(boid, goal_location)
+                    wave.append((boid, hops + 1))
+                    report.reach += 1
+                    report.hops = max(report.hops, hops + 1)
+            reports.append(report)
+        self.reports = reports
+        return reports
@@ -1,9 +1,37 @@
 import pygame
-import random
 import math
-
+import time
+
+from camera import Camera
+from cell_aggregates import cell_size_for
+from flocking import approximate_flock_steering, flock_steering
+from profiler import FrameProfiler
+from splat_renderer import SplatRenderer, boid_arrays
+from sprite_cache import ShapeCache
+from static_layer import StaticLayer
+from timestep import FixedTimestep
+from telemetry import TelemetryWriter, sample
+from trajectory import TrajectoryRecorder
+from ui_panel import UIPanel
+from world import World
+
+try:
+    from swarm_state import SwarmState
+except ImportError:  # NumPy is optional
+    SwarmState = None
+
+# Default settings; each Simulation keeps its own copy in a World
 # Screen dimensions
 WIDTH, HEIGHT = 1000, 1000
+# World dimensions; bigger than the screen to pan and zoom around a large
+# world (mouse wheel, right-button drag, arrow keys)
+WORLD_WIDTH, WORLD_HEIGHT = WIDTH, HEIGHT
+# Level of detail: with more than LOD_AGENTS boids in view, or zoomed out to
+# LOD_ZOOM_LEVEL or further, boids are drawn as pixels with a streak of
+# LOD_STREAK steps of velocity behind them (0: single pixels). Needs NumPy.
+LOD_AGENTS = 5000
+LOD_ZOOM_LEVEL = -4
+LOD_STREAK = 2
 # Boid settings
 NUM_BOIDS = 0
 MAX_SPEED = 10
@@ -12,189 +40,252 @@ OBJECT_PUSH_FORCE = 0.2
 NEIGHBOR_RADIUS = 200
 SEPARATION_RADIUS = 30
 OBJECT_SEPERATION_RADIUS = 50
+NEIGHBOR_SKIN = 40  # Extra margin of the cached neighbor lists; rebuilt once a boid moves half of it
+# 0 to 1: alignment and cohesion from per-cell sums instead of boid by boid
+# (see README). Not a general speedup: it is slower than None except for
+# dense swarms with a large radius, e.g. 5000 boids at NEIGHBOR_RADIUS 200.
+FLOCK_APPROXIMATION = None
+# Recompute the flocking forces of only one in STEERING_SLICES boids per
+# step (round-robin); 0 = enough slices to recompute ~STEERING_BUDGET boids
+STEERING_SLICES = 1
+STEERING_BUDGET = 1000
 TRIANGLE_SIZE = 5
 ATTRACTION_RADIUS = 100
 OBJECTS_IN_GOAL = False  # Flag to check if all objects are in the goal
 BROADCAST_RADIUS = 400
+USE_NUMPY_ENGINE = False  # Run the swarm on NumPy arrays (SwarmState) for very large swarms
+# Speeds and forces are per REFERENCE_STEP_MS (one frame at 30 FPS). The
+# simulation runs in fixed steps of SIM_STEP_MS, e.g. 1000 / 120 for four
+# steps per rendered frame, and at most MAX_SUBSTEPS of them per frame.
+REFERENCE_STEP_MS = 1000 / 30
+SIM_STEP_MS = 1000 / 30
+MAX_SUBSTEPS = 4
+SEED = None  # e.g. 42 to spawn the same boids every run
+RECORD_PATH = None  # e.g. "run.traj" to record every frame for replay.py
+TELEMETRY_PATH = None  # e.g. "metrics.jsonl" or "metrics.csv" to log per-frame metrics
+TELEMETRY_EVERY = 1  # Sample one in this many frames
+
+def default_world():
+    # A World with the settings above
+    return World(width=WORLD_WIDTH, height=WORLD_HEIGHT, max_speed=MAX_SPEED, max_force=MAX_FORCE,
+                 object_push_force=OBJECT_PUSH_FORCE, neighbor_radius=NEIGHBOR_RADIUS,
+                 separation_radius=SEPARATION_RADIUS, object_separation_radius=OBJECT_SEPERATION_RADIUS,
+                 attraction_radius=ATTRACTION_RADIUS, broadcast_radius=BROADCAST_RADIUS,
+                 sim_step_ms=SIM_STEP_MS, max_substeps=MAX_SUBSTEPS, neighbor_skin=NEIGHBOR_SKIN,
+                 flock_approximation=FLOCK_APPROXIMATION, steering_slices=STEERING_SLICES,
+                 steering_budget=STEERING_BUDGET, seed=SEED)
+
+# Block surfaces, so blocks can be blitted in batches
+shapes = ShapeCache()
 
 class MovableObject:
+    __slots__ = ("position", "previous_position", "velocity", "size", "mass")
+
     def __init__(self, x, y):
         self.position = pygame.Vector2(x, y)
+        self.previous_position = pygame.Vector2(x, y)  # for interpolated drawing
         self.velocity = pygame.Vector2(0, 0)
         self.size = 20  # radius for simplicity
         self.mass = 5
 
-    def update(self):
-        self.position += self.velocity
-        self.velocity *= 0.95  # friction / damping
-        if self.position.x <= 0 or self.position.x >= WIDTH:
+    def update(self, world):
+        self.previous_position.update(self.position)
+        self.position += self.velocity * world.step_scale
+        self.velocity *= 0.95 ** world.step_scale  # friction / damping, 0.95 per reference frame
+        if self.position.x <= 0 or self.position.x >= world.width:
             self.velocity.x *= -1
             # Clamp inside bounds
-            self.position.x = max(0, min(self.position.x, WIDTH))
+            self.position.x = max(0, min(self.position.x, world.width))
 
-        if self.position.y <= 0 or self.position.y >= HEIGHT:
+        if self.position.y <= 0 or self.position.y >= world.height:
             self.velocity.y *= -1
             # Clamp inside bounds
-            self.position.y = max(0, min(self.position.y, HEIGHT))
+            self.position.y = max(0, min(self.position.y, world.height))
 
 
-    def apply_force(self, force):
-        self.velocity += force / self.mass
+    def apply_force(self, world, force):
+        self.velocity += force * (world.step_scale / self.mass)
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, (255, 255, 0), self.position, self.size)
+    def draw(self, screen, alpha=1.0, camera=None):
+        position = self.previous_position.lerp(self.position, alpha)
+        if camera is None:
+            pygame.draw.circle(screen, (255, 255, 0), position, self.size)
+        else:
+            pygame.draw.circle(screen, (255, 255, 0), camera.to_screen(position), self.size * camera.zoom)
 
 class Block:
+    __slots__ = ("position", "color", "size")
+
     def __init__(self, x, y):
         self.position = pygame.Vector2(x, y)
         self.color = (255, 255, 255)  # White color for the block
         self.size = 20  # Size of the block
 
-    def draw(self, screen):
-        pygame.draw.rect(screen, self.color, (self.position.x, self.position.y, self.size, self.size))
+    def sprite(self, camera=None):
+        # (surface, top-left corner) of the block, for blit_all()
+        if camera is None:
+            return shapes.square(self.color, self.size), (self.position.x, self.position.y)
+        corner = camera.to_screen(self.position)
+        return shapes.square(self.color, self.size * camera.zoom + 1), (corner.x, corner.y)
+
+    def draw(self, screen, camera=None):
+        screen.blit(*self.sprite(camera))
 
     def get_rect(self):
         return pygame.Rect(self.position.x, self.position.y, self.size, self.size)
 
 class Boid:
-    def __init__(self, x, y):
+    # Fixed attributes instead of a per-instance __dict__, about 50 bytes
+    # less per boid, which adds up in swarms of 100k boids
+    __slots__ = ("position", "velocity", "acceleration", "steering", "previous_position",
+                 "color", "signal_time", "goal_location", "has_received")
+
+    def __init__(self, x, y, world):
         # Initialize position and velocity
         self.position = pygame.Vector2(x, y)
-        angle = random.uniform(0, 2 * math.pi)
-        self.velocity = pygame.Vector2(math.cos(angle), math.sin(angle)) * MAX_SPEED
+        angle = world.rng.uniform(0, 2 * math.pi)
+        self.velocity = pygame.Vector2(math.cos(angle), math.sin(angle)) * world.max_speed
         self.acceleration = pygame.Vector2(0, 0)
+        self.steering = pygame.Vector2(0, 0)  # last weighted flocking force, see flock()
+        self.previous_position = pygame.Vector2(self.position)  # for interpolated drawing
         self.color = (255, 0, 0)
-        self.signal_time = pygame.time.get_ticks()
+        self.signal_time = world.sim_time
         self.goal_location = ()
         self.has_received = False  # Flag to check if boid has received a message
 
-    def update(self, blocks, WIDTH, HEIGHT):
-        # Update velocity and position
-        self.velocity += self.acceleration
-        if self.velocity.length() > MAX_SPEED:
-            self.velocity.scale_to_length(MAX_SPEED)
-        self.position += self.velocity
-        self.acceleration *= 0
+    def update(self, world):
+        # Update velocity and position over this step. Done component by
+        # component, in place: every pygame.Vector2 temporary or method call
+        # is a heap allocation, and this runs for every boid every step.
+        position = self.position
+        velocity = self.velocity
+        acceleration = self.acceleration
+        scale = world.step_scale
+        self.previous_position.x = position.x
+        self.previous_position.y = position.y
+        velocity.x += acceleration.x * scale
+        velocity.y += acceleration.y * scale
+        speed = math.hypot(velocity.x, velocity.y)
+        if speed > world.max_speed:
+            velocity *= world.max_speed / speed
+        position.x += velocity.x * scale
+        position.y += velocity.y * scale
+        acceleration.x = acceleration.y = 0.0
         
-        if pygame.time.get_ticks() - self.signal_time > 100:
+        if world.sim_time - self.signal_time > 100:
             self.color = (255, 255, 255)
 
         # Screen bouncing
-        if self.position.x <= 0 or self.position.x >= WIDTH:
+        if self.position.x <= 0 or self.position.x >= world.width:
             self.velocity.x *= -1
             # Clamp inside bounds
-            self.position.x = max(0, min(self.position.x, WIDTH))
+            self.position.x = max(0, min(self.position.x, world.width))
 
-        if self.position.y <= 0 or self.position.y >= HEIGHT:
+        if self.position.y <= 0 or self.position.y >= world.height:
             self.velocity.y *= -1
             # Clamp inside bounds
-            self.position.y = max(0, min(self.position.y, HEIGHT))
-        
-        for block in blocks:
-            block_rect = block.get_rect()
-            boid_rect = pygame.Rect(self.position.x, self.position.y, 5, 5)  # A small rect for collision
-            if boid_rect.colliderect(block_rect):
-                # Simple bounce: reverse direction
-                # You can get fancier with angle of incidence/reflection later
-                if block_rect.left <= self.position.x <= block_rect.right:
-                    self.velocity.y *= -1
-                if block_rect.top <= self.position.y <= block_rect.bottom:
-                    self.velocity.x *= -1
+            self.position.y = max(0, min(self.position.y, world.height))
+
+    def bounce_off_blocks(self, world):
+        # Bounce off blocks, looked up in the obstacle bitmap (a small 5x5
+        # rect for collision). Its own pass after update(), so the profiler
+        # shows block collisions apart from moving the boids.
+        flip_x, flip_y = world.obstacle_map.bounce(self.position)
+        if flip_y:
+            # Simple bounce: reverse direction
+            # You can get fancier with angle of incidence/reflection later
+            self.velocity.y *= -1
+        if flip_x:
+            self.velocity.x *= -1
 
     def apply_force(self, force):
         self.acceleration += force
 
-    def align(self, boids):
+    def align(self, world, boids):
         steering = pygame.Vector2(0, 0)
         total = 0
         for boid in boids:
-            if boid != self and self.position.distance_to(boid.position) < NEIGHBOR_RADIUS:
+            if boid != self and self.position.distance_to(boid.position) < world.neighbor_radius:
                 steering += boid.velocity
                 total += 1
         if total > 0:
             steering /= total
-            steering = (steering.normalize() * MAX_SPEED) - self.velocity
-            if steering.length() > MAX_FORCE:
-                steering.scale_to_length(MAX_FORCE)
+            steering = (steering.normalize() * world.max_speed) - self.velocity
+            if steering.length() > world.max_force:
+                steering.scale_to_length(world.max_force)
         return steering
 
-    def cohesion(self, boids):
+    def cohesion(self, world, boids):
         steering = pygame.Vector2(0, 0)
         total = 0
         for boid in boids:
-            if boid != self and self.position.distance_to(boid.position) < NEIGHBOR_RADIUS:
+            if boid != self and self.position.distance_to(boid.position) < world.neighbor_radius:
                 steering += boid.position
                 total += 1
         if total > 0:
             steering /= total
-            steering = (steering - self.position).normalize() * MAX_SPEED - self.velocity
-            if steering.length() > MAX_FORCE:
-                steering.scale_to_length(MAX_FORCE)
+            steering = (steering - self.position).normalize() * world.max_speed - self.velocity
+            if steering.length() > world.max_force:
+                steering.scale_to_length(world.max_force)
             return steering
         return pygame.Vector2(0, 0)
 
-    def separation(self, boids, blocks):
+    def separation(self, world, boids, blocks):
         steering = pygame.Vector2(0, 0)
         total = 0
         for boid in boids:
             distance = self.position.distance_to(boid.position)
-            if boid != self and distance < SEPARATION_RADIUS:
+            if boid != self and distance < world.separation_radius:
                 diff = self.position - boid.position
                 if distance != 0:
                     diff /= distance
                 steering += diff
                 total += 1
-        # After self.position += self.velocity
-        boid_rect = pygame.Rect(self.position.x, self.position.y, 5, 5)  # A small rect for collision
-        
-        for block in blocks:
-            distance = self.position.distance_to(block.position)
-            if distance < OBJECT_SEPERATION_RADIUS:
-                diff = self.position - block.position
-                if distance != 0:
-                    diff /= distance
-                steering += diff
-                total += 1
-            block = block.get_rect()
-        
+        # Blocks within the object separation radius, summed up in advance by
+        # the obstacle map
+        away_x, away_y, count = world.obstacle_map.repulsion(self.position)
+        steering += pygame.Vector2(away_x, away_y)
+        total += count
+
         if total > 0:
             steering /= total
         if steering.length() > 0:
-            steering = steering.normalize() * MAX_SPEED - self.velocity
-            if steering.length() > MAX_FORCE:
-                steering.scale_to_length(MAX_FORCE)
+            steering = steering.normalize() * world.max_speed - self.velocity
+            if steering.length() > world.max_force:
+                steering.scale_to_length(world.max_force)
         return steering
 
-    def broadcast(self, boids, goal_location):
-        for boid in boids:
-            if boid != self and not boid.has_received and self.position.distance_to(boid.position) < BROADCAST_RADIUS:
-                boid.recieve(boids, goal_location)
-
-    def recieve(self, boids, goal_location):
-        if not self.has_received:
-            self.has_received = True
-            self.color = (0, 255, 0)
-            self.broadcast(boids, goal_location)
-            self.goal_location = goal_location
-            self.signal_time = pygame.time.get_ticks()
-            self.apply_force(self.move_to_location(self.goal_location))
-
-    def push_object(self, objects, goal):
+    def broadcast(self, world, boids, goal_location):
+        # Queue the message; Simulation.propagate() spreads it from boid to
+        # boid within the broadcast radius once the whole swarm has flocked
+        world.broadcasts.send(self, goal_location)
+
+    def recieve(self, world, boids, goal_location):
+        # Called by the broadcast wave, which has already set has_received
+        # and passes the message on to this boid's neighbors
+        self.color = (0, 255, 0)
+        self.goal_location = goal_location
+        self.signal_time = world.sim_time
+        self.apply_force(self.move_to_location(world, self.goal_location))
+
+    def push_object(self, world, objects, goal):
         for obj in objects:
             to_object = obj.position - self.position
             if to_object.length() < 30:
                 push_dir = (goal - obj.position).normalize()
-                force = push_dir * OBJECT_PUSH_FORCE
-                obj.apply_force(force)
+                force = push_dir * world.object_push_force
+                obj.apply_force(world, force)
     
-    def move_to_location(self, location):
+    def move_to_location(self, world, location):
+        if location == self.position:
+            return pygame.Vector2(0, 0)  # Already there (e.g. both clamped into a corner)
         direction = (location - self.position).normalize()
-        steer = direction * MAX_SPEED - self.velocity
-        if steer.length() > MAX_FORCE:
-            steer.scale_to_length(MAX_FORCE)
+        steer = direction * world.max_speed - self.velocity
+        if steer.length() > world.max_force:
+            steer.scale_to_length(world.max_force)
         return steer
 
-    def attract_to_object(self, boids, objects, target_position):
+    def attract_to_object(self, world, boids, objects, target_position):
         closest_object = None
         min_distance = float('inf')
 
@@ -210,13 +301,13 @@ class Boid:
                 closest_object = obj
 
         # If a closest object is found and within the attraction radius
-        if closest_object and min_distance < ATTRACTION_RADIUS:
-            self.broadcast(boids, closest_object.position)
-            return self.move_to_location(closest_object.position)
+        if closest_object and min_distance < world.attraction_radius:
+            self.broadcast(world, boids, closest_object.position)
+            return self.move_to_location(world, closest_object.position)
 
         return pygame.Vector2(0, 0)
 
-    def resolve_collision_with_ball(self, objects):
+    def resolve_collision_with_ball(self, world, objects):
         for ball in objects:
             distance = self.position.distance_to(ball.position)
             overlap = ball.size + 5 - distance  # 5 is boid "radius"
@@ -228,160 +319,307 @@ class Boid:
                 self.velocity.reflect_ip(push_dir)  # reflect direction
 
                 # Optional: also apply a force to the ball (Newton's Third Law)
-                ball.apply_force(-push_dir * 0.5)  # tweak force amount
-
+                ball.apply_force(world, -push_dir * 0.5)  # tweak force amount
 
-    def flock(self, boids, blocks, target_position):
-        # Apply the three main forces
-        alignment = self.align(boids)
-        cohesion = self.cohesion(boids)
-        separation = self.separation(boids, blocks)
 
-        # Weigh the forces
-        self.apply_force(alignment * 1.0)
-        self.apply_force(cohesion * 1.0)
-        self.apply_force(separation * 1.5)
+    def flock(self, world, boids, blocks, target_position):
+        # Recompute the flocking force, keep it in self.steering for the
+        # steps that reuse it (see Simulation.flock) and apply it
+        steering = self.steering
+        steering.x, steering.y = self.steering_force(world)
+        self.acceleration += steering
         
-        #self.push_object(objects, target_position)
-        #self.apply_force(self.attract_to_object(boids, objects, target_position))
-
+        #self.push_object(world, objects, target_position)
+        #self.apply_force(self.attract_to_object(world, boids, objects, target_position))
+
+    def steering_force(self, world):
+        # Alignment, cohesion and separation, weighed and summed, as (x, y)
+        if world.flock_approximation is not None:
+            # Alignment and cohesion from the per-cell sums of nearby boids
+            ax, ay, cx, cy, sx, sy = approximate_flock_steering(
+                self, world.cell_aggregates, world.obstacle_map, world.neighbor_radius, world.separation_radius,
+                world.max_speed, world.max_force, world.flock_approximation)
+        else:
+            # Only boids in this boid's neighbor list can be within either radius
+            neighbors = world.neighbor_list.get(self)
+            if neighbors is None:  # not there when the lists were last built
+                neighbors = world.neighbor_grid.query(self.position, max(world.neighbor_radius, world.separation_radius))
+
+            # The three main forces, computed together in one neighbor pass
+            ax, ay, cx, cy, sx, sy = flock_steering(
+                self, neighbors, world.obstacle_map, world.neighbor_radius, world.separation_radius,
+                world.max_speed, world.max_force)
 
-    def draw(self, screen):
-        # Draw a simple triangle for the boid
+        # Weigh the forces
+        return ax * 1.0 + cx * 1.0 + sx * 1.5, ay * 1.0 + cy * 1.0 + sy * 1.5
+
+    def draw(self, screen, alpha=1.0, camera=None):
+        # Draw a simple triangle for the boid, alpha of the way from its
+        # previous to its current position
+        position = self.previous_position.lerp(self.position, alpha)
+        size = TRIANGLE_SIZE
+        if camera is not None:
+            position = camera.to_screen(position)
+            size *= camera.zoom
         angle = math.atan2(self.velocity.y, self.velocity.x)
         points = [
-            self.position + pygame.Vector2(math.cos(angle) * TRIANGLE_SIZE, math.sin(angle) * TRIANGLE_SIZE),
-            self.position + pygame.Vector2(math.cos(angle + 2.5) * TRIANGLE_SIZE, math.sin(angle + 2.5) * TRIANGLE_SIZE),
-            self.position + pygame.Vector2(math.cos(angle - 2.5) * TRIANGLE_SIZE, math.sin(angle - 2.5) * TRIANGLE_SIZE),
+            position + pygame.Vector2(math.cos(angle) * size, math.sin(angle) * size),
+            position + pygame.Vector2(math.cos(angle + 2.5) * size, math.sin(angle + 2.5) * size),
+            position + pygame.Vector2(math.cos(angle - 2.5) * size, math.sin(angle - 2.5) * size),
         ]
 
         pygame.draw.polygon(screen, self.color, points)
 
+class Simulation:
+    # The swarm without any window or event handling. main() steps it with
+    # the real frame time; headless.py steps it as fast as the CPU allows.
+    # Settings and clock live in self.world, so simulations are independent.
+    def __init__(self, num_boids=NUM_BOIDS, use_numpy=USE_NUMPY_ENGINE, world=None):
+        self.world = world = world if world is not None else default_world()
+        self.boids = [Boid(world.rng.randint(0, world.width), world.rng.randint(0, world.height), world) for _ in range(num_boids)]
+        if use_numpy:
+            if SwarmState is None:
+                print("NumPy is not installed, using the regular Boid objects")
+            else:
+                # Same list interface (append/pop/len/iteration), but the
+                # simulation runs on arrays
+                swarm = SwarmState(Boid.draw)
+                for boid in self.boids:
+                    swarm.append(boid)
+                self.boids = swarm
+        self.blocks = []
+
+        # Target position and radius for the movable object
+        self.target_position = pygame.Vector2(world.width - 100, world.height - 100)
+        self.target_radius = 40
+        self.frames = 0
+
+        # Black background with the blocks, redrawn only when they change
+        self.background = StaticLayer((0, 0, 0))
+        # Draws big swarms as pixels instead of triangles
+        self.splats = SplatRenderer(LOD_AGENTS, LOD_ZOOM_LEVEL, LOD_STREAK)
+
+        self.timestep = FixedTimestep(world.sim_step_ms, world.max_substeps)
+
+        # Named parts of a step, in order, each timed by the profiler
+        self.profiler = FrameProfiler()
+        self.phases = [("flock", self.flock), ("broadcast", self.propagate), ("update", self.update),
+                       ("blocks", self.bounce_off_blocks)]
+
+    def new_boid(self):
+        # A boid at a random spot in this simulation's world
+        world = self.world
+        return Boid(world.rng.randint(0, world.width), world.rng.randint(0, world.height), world)
+
+    def step(self, dt=None):
+        # Advance one step of dt ms (default: the world's sim_step_ms) as its
+        # own profiler frame; callers can time more phases (drawing, UI) into
+        # it. headless.py and benchmark.py step the simulation this way.
+        self.profiler.begin_frame()
+        self.substep(self.world.sim_step_ms if dt is None else dt)
+
+    def advance(self, frame_ms):
+        # Advance by the real time of one rendered frame, in fixed steps of
+        # sim_step_ms (see FixedTimestep). Returns the number of steps run;
+        # self.timestep.alpha is what draw() interpolates with.
+        self.profiler.begin_frame()
+        return self.timestep.advance(frame_ms, self.substep)
+
+    def substep(self, dt):
+        # Motion scales with dt, so speeds and forces mean the same at any
+        # step length; dt also advances the clock used by the signal color timer.
+        world = self.world
+        world.sim_time += dt
+        world.step_scale = dt / REFERENCE_STEP_MS
+        self.frames += 1
+        for name, phase in self.phases:
+            with self.profiler.phase(name):
+                phase()
+
+    def flock(self):
+        world, boids = self.world, self.boids
+        if isinstance(boids, list):
+            # Index boids once so every flock() call sees the same frame
+            world.neighbor_grid.rebuild(boids, max(world.neighbor_radius, world.separation_radius), world.width, world.height)
+            if world.flock_approximation is not None:
+                world.cell_aggregates.rebuild(boids, cell_size_for(world.neighbor_radius), world.width, world.height)
+            else:
+                world.neighbor_list.update(boids, max(world.neighbor_radius, world.separation_radius),
+                                           world.neighbor_skin)
+            world.obstacle_map.sync(self.blocks, world.width, world.height, world.object_separation_radius)
+            # Round-robin: each step recomputes every slices-th boid, starting
+            # one further along; the others steer by their last forces
+            slices = world.steering_slices or max(1, math.ceil(len(boids) / world.steering_budget))
+            turn = self.frames % slices
+            for i, boid in enumerate(boids):
+                if i % slices == turn:
+                    boid.flock(world, boids, self.blocks, self.target_position)
+                else:
+                    boid.acceleration += boid.steering
+        else:
+            boids.flock(self.blocks, world.neighbor_radius, world.separation_radius, world.object_separation_radius,
+                        world.max_speed, world.max_force)
+
+    def add_block(self, x, y):
+        # Holding the mouse still would otherwise stack blocks on one spot
+        world = self.world
+        world.obstacle_map.sync(self.blocks, world.width, world.height, world.object_separation_radius)
+        if world.obstacle_map.contains(x, y):
+            return None
+        block = Block(x, y)
+        self.blocks.append(block)
+        return block
+
+    def propagate(self):
+        world, boids = self.world, self.boids
+        if isinstance(boids, list):
+            world.broadcasts.propagate(world.neighbor_grid, world.broadcast_radius,
+                                       lambda boid, goal_location: boid.recieve(world, boids, goal_location))
+
+    def update(self):
+        world, boids = self.world, self.boids
+        if isinstance(boids, list):
+            for boid in boids:
+                boid.update(world)
+                boid.has_received = False  # Reset the flag after each update
+        else:
+            boids.update(world.width, world.height, world.max_speed, world.sim_time, world.step_scale)
+
+    def bounce_off_blocks(self):
+        world, boids = self.world, self.boids
+        if isinstance(boids, list):
+            for boid in boids:
+                boid.bounce_off_blocks(world)
+        else:
+            boids.bounce_off_blocks(self.blocks)
+
+    def draw_background(self, screen, camera=None):
+        # Replaces screen.fill(): the background and all blocks in one blit
+        self.background.draw(screen, self.blocks, camera)
+
+    def visible_boids(self, camera):
+        # The boids in the camera's view, from the grid built for this step
+        # instead of going through every boid; for the NumPy engine, their
+        # indices. The grid has the boids where the step started: the margin
+        # covers how far they have moved since, plus the size of their
+        # triangle.
+        world, boids = self.world, self.boids
+        margin = world.max_speed * world.step_scale + TRIANGLE_SIZE
+        left, top, right, bottom = camera.viewport(margin)
+        if isinstance(boids, list):
+            return world.neighbor_grid.query_rect(left, top, right, bottom)
+        return boids.inside(left, top, right, bottom)
+
+    def draw(self, screen, alpha=1.0, camera=None):
+        # alpha interpolates between the last two steps (1.0 = latest). With
+        # a camera, only the boids in its view are drawn. Too many of them,
+        # or too far zoomed out, and they are splatted as pixels instead.
+        boids, splats = self.boids, self.splats
+        if isinstance(boids, list):
+            visible = boids if camera is None else self.visible_boids(camera)
+            if splats.wanted(len(visible), camera) and splats.draw(screen, *boid_arrays(visible, alpha), camera):
+                return
+        else:
+            # The NumPy engine: splatted straight from its arrays
+            indices = None if camera is None else self.visible_boids(camera)
+            count = len(boids) if indices is None else len(indices)
+            if splats.wanted(count, camera) and splats.draw(screen, *boids.draw_arrays(alpha, indices), camera):
+                return
+            visible = boids if indices is None else [boids.views[i] for i in indices.tolist()]
+        for boid in visible:
+            boid.draw(screen, alpha, camera)
+
 def main():
-    global NUM_BOIDS, MAX_SPEED, MAX_FORCE, NEIGHBOR_RADIUS, SEPARATION_RADIUS, WIDTH, HEIGHT, OBJECT_SEPERATION_RADIUS, OBJECTS_IN_GOAL
+    global OBJECTS_IN_GOAL
     mouse_held=False
     pygame.init()
-    font = pygame.font.SysFont(None, 15)  # You can change font size or type
     screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
     pygame.display.set_caption("Swarm Simulation")
     clock = pygame.time.Clock()
     last_add_time = pygame.time.get_ticks()
 
-    # Create boids
-    boids = [Boid(random.randint(0, WIDTH), random.randint(0, HEIGHT)) for _ in range(NUM_BOIDS)]
-    movable_object_1 = MovableObject(random.randint(0, WIDTH), random.randint(0, HEIGHT))
-    movable_object_2 = MovableObject(random.randint(0, WIDTH), random.randint(0, HEIGHT))
-    movable_object_3 = MovableObject(random.randint(0, WIDTH), random.randint(0, HEIGHT))
-
-    #objects = [movable_object_1, movable_object_2, movable_object_3]
-    blocks = []
-
-    # Target position and radius for the movable object
-    target_position = pygame.Vector2(WIDTH - 100, HEIGHT - 100)
-    target_radius = 40
+    sim = Simulation()
+    world = sim.world
+    camera = Camera(WIDTH, HEIGHT, world.width, world.height)
+    camera.center_on(world.width / 2, world.height / 2)
+    recorder = TrajectoryRecorder(RECORD_PATH, sim.world) if RECORD_PATH else None
+    telemetry = TelemetryWriter(TELEMETRY_PATH, every=TELEMETRY_EVERY) if TELEMETRY_PATH else None
+    boids = sim.boids
+    target_position = sim.target_position
+    target_radius = sim.target_radius
+
+    a = 140
+    b = 10
+    c = 50
+    d = 10
+
+    panel = UIPanel()
+    button_add_boids = panel.add_button(pygame.Rect(a, b, c, d), "+")  # Button to add boids
+    button_remove_boids = panel.add_button(pygame.Rect(a+60, b, c, d), "-")  # Button to remove boids
+    button_add_speed = panel.add_button(pygame.Rect(a, b+20, c, d), "+")  # Button to increase speed
+    button_remove_speed = panel.add_button(pygame.Rect(a+60, b+20, c, d), "-")
+    button_add_force = panel.add_button(pygame.Rect(a, b+40, c, d), "+")  # Button to increase force
+    button_remove_force = panel.add_button(pygame.Rect(a+60, b+40, c, d), "-")
+    button_add_neighbor_radius = panel.add_button(pygame.Rect(a, b+60, c, d), "+")
+    button_remove_neighbor_radius = panel.add_button(pygame.Rect(a+60, b+60, c, d), "-")
+    button_add_separation_radius = panel.add_button(pygame.Rect(a, b+80, c, d), "+")
+    button_remove_separation_radius = panel.add_button(pygame.Rect(a+60, b+80, c, d), "-")
+    button_add_object_separation_radius = panel.add_button(pygame.Rect(a, b+100, c, d), "+")
+    button_remove_object_separation_radius = panel.add_button(pygame.Rect(a+60, b+100, c, d), "-")
 
     running = True
+    show_profiler = False  # Toggled with F3
+    frame_ms = 1000 / 30
     while running:
         current_time = pygame.time.get_ticks()
-        screen.fill((0, 0, 0))  # Black background
-
-        a = 140
-        b = 10
-        c = 50
-        d = 10
-
-        button_add_boids = pygame.Rect(a, b, c, d)  # Button to add boids
-        button_remove_boids = pygame.Rect(a+60, b, c, d)  # Button to remove boids
-        button_add_speed = pygame.Rect(a, b+20, c, d)  # Button to increase speed
-        button_remove_speed = pygame.Rect(a+60, b+20, c, d)
-        button_add_force = pygame.Rect(a, b+40, c, d)  # Button to increase force
-        button_remove_force = pygame.Rect(a+60, b+40, c, d)
-        button_add_neighbor_radius = pygame.Rect(a, b+60, c, d)
-        button_remove_neighbor_radius = pygame.Rect(a+60, b+60, c, d)
-        button_add_separation_radius = pygame.Rect(a, b+80, c, d)
-        button_remove_separation_radius = pygame.Rect(a+60, b+80, c, d)
-        button_add_object_separation_radius = pygame.Rect(a, b+100, c, d)
-        button_remove_object_separation_radius = pygame.Rect(a+60, b+100, c, d)
-
-        pygame.draw.rect(screen, (255, 255, 255), button_add_boids)
-        pygame.draw.rect(screen, (255, 255, 255), button_remove_boids)
-        pygame.draw.rect(screen, (255, 255, 255), button_add_speed)
-        pygame.draw.rect(screen, (255, 255, 255), button_remove_speed)
-        pygame.draw.rect(screen, (255, 255, 255), button_add_force)
-        pygame.draw.rect(screen, (255, 255, 255), button_remove_force)
-        pygame.draw.rect(screen, (255, 255, 255), button_add_neighbor_radius)
-        pygame.draw.rect(screen, (255, 255, 255), button_remove_neighbor_radius)
-        pygame.draw.rect(screen, (255, 255, 255), button_add_separation_radius)
-        pygame.draw.rect(screen, (255, 255, 255), button_remove_separation_radius)
-        pygame.draw.rect(screen, (255, 255, 255), button_add_object_separation_radius)
-        pygame.draw.rect(screen, (255, 255, 255), button_remove_object_separation_radius)
-
-        plus_text = font.render("+", True, (0, 0 , 0))  # Black text for plus button
-        minus_text = font.render("-", True, (0, 0, 0))  # Black text for minus button
-
-        for button, label in [
-            (button_add_boids, "+"),
-            (button_remove_boids, "-"),
-            (button_add_speed, "+"),
-            (button_remove_speed, "-"),
-            (button_add_force, "+"),
-            (button_remove_force, "-"),
-            (button_add_neighbor_radius, "+"),
-            (button_remove_neighbor_radius, "-"),
-            (button_add_separation_radius, "+"),
-            (button_remove_separation_radius, "-"),
-            (button_add_object_separation_radius, "+"),
-            (button_remove_object_separation_radius, "-")
-        ]:
-            text = font.render(label, True, (0, 0, 0))  # Black text
-            text_rect = text.get_rect(center=button.center)
-            screen.blit(text, text_rect)
-
+        ui_start = time.perf_counter()
 
         for event in pygame.event.get():
+            if camera.handle_event(event):
+                continue
             if event.type == pygame.QUIT:
                 running = False
-            if event.type == pygame.KEYDOWN:
-                new_boid = Boid(random.randint(0, WIDTH), random.randint(0, HEIGHT))
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                show_profiler = not show_profiler
+            elif event.type == pygame.KEYDOWN:
+                new_boid = sim.new_boid()
                 boids.append(new_boid)
-            if event.type == pygame.VIDEORESIZE:
-                WIDTH, HEIGHT = event.w, event.h
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:  # Left click
                 if button_add_boids.collidepoint(event.pos):
-                    new_boid = Boid(random.randint(0, WIDTH), random.randint(0, HEIGHT))
+                    new_boid = sim.new_boid()
                     boids.append(new_boid)
 
                 elif button_remove_boids.collidepoint(event.pos):
                     if boids:
                         boids.pop()
                 elif button_add_speed.collidepoint(event.pos):
-                    MAX_SPEED += 1
+                    world.max_speed += 1
                 elif button_remove_speed.collidepoint(event.pos):
-                    if MAX_SPEED > 1:
-                        MAX_SPEED -= 1
+                    if world.max_speed > 1:
+                        world.max_speed -= 1
                 elif button_add_force.collidepoint(event.pos):
-                    MAX_FORCE += 0.1
+                    world.max_force += 0.1
                 elif button_remove_force.collidepoint(event.pos):
-                    if MAX_FORCE > 0.1:
-                        MAX_FORCE -= 0.1
+                    if world.max_force > 0.1:
+                        world.max_force -= 0.1
                 elif button_add_neighbor_radius.collidepoint(event.pos):
-                    NEIGHBOR_RADIUS += 10
+                    world.neighbor_radius += 10
                 elif button_remove_neighbor_radius.collidepoint(event.pos):
-                    if NEIGHBOR_RADIUS > 10:
-                        NEIGHBOR_RADIUS -= 10
+                    if world.neighbor_radius > 10:
+                        world.neighbor_radius -= 10
                 elif button_add_separation_radius.collidepoint(event.pos):
-                    SEPARATION_RADIUS += 10
+                    world.separation_radius += 10
                 elif button_remove_separation_radius.collidepoint(event.pos):
-                    if SEPARATION_RADIUS > 10:
-                        SEPARATION_RADIUS -= 10
+                    if world.separation_radius > 10:
+                        world.separation_radius -= 10
                 elif button_add_object_separation_radius.collidepoint(event.pos):
-                    OBJECT_SEPERATION_RADIUS += 10
+                    world.object_separation_radius += 10
                 elif button_remove_object_separation_radius.collidepoint(event.pos):
-                    if OBJECT_SEPERATION_RADIUS > 10:
-                        OBJECT_SEPERATION_RADIUS -= 10
+                    if world.object_separation_radius > 10:
+                        world.object_separation_radius -= 10
                 else:
-                    Block(event.pos[0], event.pos[1]).draw(screen)
-                    blocks.append(Block(event.pos[0], event.pos[1]))
+                    spot = camera.to_world(event.pos)
+                    sim.add_block(spot.x, spot.y)
 
                 
                 mouse_held = True
@@ -390,7 +628,7 @@ def main():
         
         if current_time - last_add_time > 50:
             if mouse_held and button_add_boids.collidepoint(pygame.mouse.get_pos()):
-                new_boid = Boid(random.randint(0, WIDTH), random.randint(0, HEIGHT))
+                new_boid = sim.new_boid()
                 boids.append(new_boid)
                 last_add_time = current_time
             elif mouse_held and button_remove_boids.collidepoint(pygame.mouse.get_pos()):
@@ -398,87 +636,89 @@ def main():
                     boids.pop()
                 last_add_time = current_time
             elif mouse_held and button_add_speed.collidepoint(pygame.mouse.get_pos()):
-                MAX_SPEED += 1
+                world.max_speed += 1
                 last_add_time = current_time
             elif mouse_held and button_remove_speed.collidepoint(pygame.mouse.get_pos()):
-                if MAX_SPEED > 1:
-                    MAX_SPEED -= 1
+                if world.max_speed > 1:
+                    world.max_speed -= 1
                 last_add_time = current_time
             elif mouse_held and button_add_force.collidepoint(pygame.mouse.get_pos()):
-                MAX_FORCE += 0.1
+                world.max_force += 0.1
                 last_add_time = current_time
             elif mouse_held and button_remove_force.collidepoint(pygame.mouse.get_pos()):
-                if MAX_FORCE > 0.1:
-                    MAX_FORCE -= 0.1
+                if world.max_force > 0.1:
+                    world.max_force -= 0.1
                 last_add_time = current_time
             elif mouse_held and button_add_neighbor_radius.collidepoint(pygame.mouse.get_pos()):
-                NEIGHBOR_RADIUS += 10
+                world.neighbor_radius += 10
                 last_add_time = current_time
             elif mouse_held and button_remove_neighbor_radius.collidepoint(pygame.mouse.get_pos()):
-                if NEIGHBOR_RADIUS > 10:
-                    NEIGHBOR_RADIUS -= 10
+                if world.neighbor_radius > 10:
+                    world.neighbor_radius -= 10
                 last_add_time = current_time
             elif mouse_held and button_add_separation_radius.collidepoint(pygame.mouse.get_pos()):
-                SEPARATION_RADIUS += 10
+                world.separation_radius += 10
                 last_add_time = current_time
             elif mouse_held and button_remove_separation_radius.collidepoint(pygame.mouse.get_pos()):
-                if SEPARATION_RADIUS > 10:
-                    SEPARATION_RADIUS -= 10
+                if world.separation_radius > 10:
+                    world.separation_radius -= 10
                 last_add_time = current_time
             elif mouse_held and button_add_object_separation_radius.collidepoint(pygame.mouse.get_pos()):
-                OBJECT_SEPERATION_RADIUS += 10
+                world.object_separation_radius += 10
                 last_add_time = current_time
             elif mouse_held and button_remove_object_separation_radius.collidepoint(pygame.mouse.get_pos()):
-                if OBJECT_SEPERATION_RADIUS > 10:
-                    OBJECT_SEPERATION_RADIUS -= 10
+                if world.object_separation_radius > 10:
+                    world.object_separation_radius -= 10
                 last_add_time = current_time
             elif mouse_held:
                 # Add a block at the mouse position
-                new_block = Block(pygame.mouse.get_pos()[0], pygame.mouse.get_pos()[1])
-                blocks.append(new_block)
+                spot = camera.to_world(pygame.mouse.get_pos())
+                sim.add_block(spot.x, spot.y)
                 last_add_time = current_time
 
-        # Update and draw boids
-        for boid in boids:
-            boid.flock(boids, blocks, target_position)
-            boid.update(blocks, WIDTH, HEIGHT)
-            boid.draw(screen)
-            boid.has_received = False  # Reset the flag after each update
-        
-        for block in blocks:
-            block.draw(screen)
-
-
-        # Display the number of boids
-        # Render the text
-        boid_count_text = font.render(f"Boids: {len(boids)}", True, (255, 255, 255))  # White text
-        max_speed_text = font.render(f"Max Speed: {MAX_SPEED}", True, (255, 255, 255))
-        max_force_text = font.render(f"Max Force: {round(MAX_FORCE, 2)}", True, (255, 255, 255))
-        neighbor_radius_text = font.render(f"Neighbor Radius: {NEIGHBOR_RADIUS}", True, (255, 255, 255))
-        separation_radius_text = font.render(f"Separation Radius: {SEPARATION_RADIUS}", True, (255, 255, 255))
-        width_text = font.render(f"Window Width: {WIDTH}", True, (255, 255, 255))
-        height_text = font.render(f"Window Height: {HEIGHT}", True, (255, 255, 255))
-        object_separation_radius_text = font.render(f"Object Separation: {OBJECT_SEPERATION_RADIUS}", True, (255, 255, 255))
-
-        # Draw it on screen at top-left
-        screen.blit(boid_count_text, (10, 10))  # Position: (x=10, y=10)
-        screen.blit(max_speed_text, (10, 30))
-        screen.blit(max_force_text, (10, 50))
-        screen.blit(neighbor_radius_text, (10, 70))
-        screen.blit(separation_radius_text, (10, 90))
-        screen.blit(object_separation_radius_text, (10, 110))
-        screen.blit(width_text, (10, 130))
-        screen.blit(height_text, (10, 150))
+        ui_time = time.perf_counter() - ui_start
+
+        if sim.advance(frame_ms) and recorder is not None:
+            recorder.record(sim)
+        sim.profiler.add("ui", ui_time)
+        with sim.profiler.phase("draw"):
+            sim.draw_background(screen, camera)
+            sim.draw(screen, sim.timestep.alpha, camera)
+
+        ui_start = time.perf_counter()
+        # Buttons and settings; labels are only rendered again when their
+        # value changes
+        panel.set_labels([
+            ((10, 10), f"Boids: {len(boids)}"),
+            ((10, 30), f"Max Speed: {world.max_speed}"),
+            ((10, 50), f"Max Force: {round(world.max_force, 2)}"),
+            ((10, 70), f"Neighbor Radius: {world.neighbor_radius}"),
+            ((10, 90), f"Separation Radius: {world.separation_radius}"),
+            ((10, 110), f"Object Separation: {world.object_separation_radius}"),
+            ((10, 130), f"World Width: {world.width}"),
+            ((10, 150), f"World Height: {world.height}"),
+        ])
+        panel.draw(screen)
         
         truths = []
         if truths == [True, True, True]:
             pygame.draw.circle(screen, (0, 255, 0), target_position, target_radius)
             OBJECTS_IN_GOAL = True  # filled goal
             # Maybe show text: “Success!”
-        
-        pygame.display.flip()
-        clock.tick(30)
+        sim.profiler.add("ui", time.perf_counter() - ui_start)
 
+        if show_profiler:
+            sim.profiler.draw(screen)
+
+        pygame.display.flip()
+        frame_ms = clock.tick(30)
+        if telemetry is not None and telemetry.due():
+            telemetry.submit(sample(sim, frame_ms))
+
+    if recorder is not None:
+        recorder.close()
+    if telemetry is not None:
+        telemetry.close()
     pygame.quit()
 
 if __name__ == "__main__":
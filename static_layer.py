@@ -0,0 +1,75 @@
+import pygame
+
+from spatial_grid import SpatialGrid
+from sprite_cache import blit_all
+
+BLOCK_CELL_SIZE = 100  # of the grid the blocks are found through
+
+
+class StaticLayer:
+    # The background and the scenery that never moves (blocks, the soccer
+    # base), drawn once onto a surface the size of the window. Blocks are
+    # only ever appended, so a new block is drawn onto the existing surface;
+    # everything is redrawn only when the window size or the camera changes
+    # or blocks were removed. Each frame is then a single blit. With a
+    # camera only the blocks in view are drawn, found through a grid of the
+    # blocks rather than by going through all of them. Blocks are drawn with
+    # one blit_all() of their sprite() pairs.
+    def __init__(self, color, draw_scenery=None):
+        self.color = color
+        self.draw_scenery = draw_scenery  # draw_scenery(surface, camera), called on a full redraw
+        self.surface = None
+        self.baked_blocks = 0  # how many blocks are already on the surface
+        self.view = None  # camera.view() the surface was drawn for
+        self.block_grid = SpatialGrid(BLOCK_CELL_SIZE)
+        self.indexed_blocks = -1  # how many blocks are in block_grid
+        self.largest_block = 0
+
+    def invalidate(self):
+        self.surface = None
+
+    def _index(self, blocks):
+        # Blocks are only appended or cleared, so the count tells whether the
+        # grid is out of date
+        if len(blocks) == self.indexed_blocks:
+            return
+        right = bottom = 0
+        self.largest_block = 0
+        for block in blocks:
+            if block.position.x > right:
+                right = block.position.x
+            if block.position.y > bottom:
+                bottom = block.position.y
+            if block.size > self.largest_block:
+                self.largest_block = block.size
+        self.block_grid.rebuild(blocks, BLOCK_CELL_SIZE, right, bottom)
+        self.indexed_blocks = len(blocks)
+
+    def _bake(self, screen, blocks, camera):
+        size = screen.get_size()
+        view = None if camera is None else camera.view()
+        if self.surface is None or self.surface.get_size() != size or len(blocks) < self.baked_blocks \
+                or view != self.view:
+            self.surface = pygame.Surface(size, 0, screen)
+            self.surface.fill(self.color)
+            if self.draw_scenery is not None:
+                self.draw_scenery(self.surface, camera)
+            self.view = view
+            if camera is not None:
+                # Blocks are anchored at their top-left corner
+                self._index(blocks)
+                left, top, right, bottom = camera.viewport()
+                visible = self.block_grid.query_rect(left - self.largest_block, top - self.largest_block, right, bottom)
+                blit_all(self.surface, [block.sprite(camera) for block in visible])
+                self.baked_blocks = len(blocks)
+                return
+            self.baked_blocks = 0
+        blit_all(self.surface, [block.sprite(camera) for block in blocks[self.baked_blocks:]])
+        self.baked_blocks = len(blocks)
+
+    def draw(self, screen, blocks, camera=None):
+        view = None if camera is None else camera.view()
+        if self.surface is None or self.surface.get_size() != screen.get_size() or len(blocks) != self.baked_blocks \
+                or view != self.view:
+            self._bake(screen, blocks, camera)
+        screen.blit(self.surface, (0, 0))
@@ -1,19 +1,47 @@
-
 import pygame
 import os
-import random
 import math
-
+import time
+
+from camera import Camera
+from cell_aggregates import cell_size_for
+from flocking import approximate_flock_steering, flock_steering
+from profiler import FrameProfiler
+from splat_renderer import SplatRenderer, boid_arrays
+from sprite_cache import RotationCache, ShapeCache, blit_all
+from static_layer import StaticLayer
+from timestep import FixedTimestep
+from telemetry import TelemetryWriter, sample
+from trajectory import TrajectoryRecorder
+from ui_panel import UIPanel
+from world import World
+
+# Default settings; each Simulation keeps its own copy in a Colony
 # Screen dimensions
 WIDTH, HEIGHT = 1000, 1000
+# World dimensions; bigger than the screen to pan and zoom around a large
+# world (mouse wheel, right-button drag, arrow keys)
+WORLD_WIDTH, WORLD_HEIGHT = WIDTH, HEIGHT
+# Level of detail: with more than LOD_AGENTS ants in view, or zoomed out to
+# LOD_ZOOM_LEVEL or further, ants are drawn as pixels with a streak of
+# LOD_STREAK steps of velocity behind them (0: single pixels). Needs NumPy.
+LOD_AGENTS = 5000
+LOD_ZOOM_LEVEL = -4
+LOD_STREAK = 2
 # Boid settings
 NUM_BOIDS = 10
+NUM_OBJECTS = 3  # Balls to bring to the goal
 MAX_SPEED = 5
 MAX_FORCE = 1
 OBJECT_PUSH_FORCE = 0.2
 NEIGHBOR_RADIUS = 200
 SEPARATION_RADIUS = 30
 OBJECT_SEPERATION_RADIUS = 50
+NEIGHBOR_SKIN = 40  # Extra margin of the cached neighbor lists; rebuilt once a boid moves half of it
+# 0 to 1: alignment and cohesion from per-cell sums instead of boid by boid
+# (see README). Not a general speedup: it is slower than None except for
+# dense swarms with a large radius, e.g. 5000 boids at NEIGHBOR_RADIUS 200.
+FLOCK_APPROXIMATION = None
 TRIANGLE_SIZE = 5
 ATTRACTION_RADIUS = 100
 OBJECTS_IN_GOAL = False  # Flag to check if all objects are in the goal
@@ -24,118 +52,96 @@ QUEENS = 1
 WORKERS = 10
 LARVA = 0
 FOOD = 0
-
-def render_UI(screen, boids):
-    global NUM_BOIDS, MAX_SPEED, MAX_FORCE, NEIGHBOR_RADIUS, SEPARATION_RADIUS, OBJECT_SEPERATION_RADIUS, WIDTH, HEIGHT
-    font = pygame.font.SysFont(None, 15)
-
+ANT_ROTATION_STEP = 3  # Degrees between the cached rotations of the ant sprite
+# Speeds and forces are per REFERENCE_STEP_MS (one frame at 30 FPS). The
+# simulation runs in fixed steps of SIM_STEP_MS, e.g. 1000 / 120 for four
+# steps per rendered frame, and at most MAX_SUBSTEPS of them per frame.
+REFERENCE_STEP_MS = 1000 / 30
+SIM_STEP_MS = 1000 / 30
+MAX_SUBSTEPS = 4
+SEED = None  # e.g. 42 to spawn and wander the same way every run
+RECORD_PATH = None  # e.g. "run.traj" to record every frame for replay.py
+TELEMETRY_PATH = None  # e.g. "metrics.jsonl" or "metrics.csv" to log per-frame metrics
+TELEMETRY_EVERY = 1  # Sample one in this many frames
+
+class Colony(World):
+    # A World with the colony's economy
+    __slots__ = ("queens", "workers", "larva", "food")
+
+    def __init__(self, queens=1, workers=10, larva=0, food=0, **settings):
+        super().__init__(**settings)
+        self.queens = queens
+        self.workers = workers
+        self.larva = larva
+        self.food = food
+
+def default_world():
+    # A Colony with the settings above
+    return Colony(queens=QUEENS, workers=WORKERS, larva=LARVA, food=FOOD,
+                  width=WORLD_WIDTH, height=WORLD_HEIGHT, max_speed=MAX_SPEED, max_force=MAX_FORCE,
+                  object_push_force=OBJECT_PUSH_FORCE, neighbor_radius=NEIGHBOR_RADIUS,
+                  separation_radius=SEPARATION_RADIUS, object_separation_radius=OBJECT_SEPERATION_RADIUS,
+                  attraction_radius=ATTRACTION_RADIUS, broadcast_radius=BROADCAST_RADIUS,
+                  target_hold_time=TARGET_HOLD_TIME, sim_step_ms=SIM_STEP_MS, max_substeps=MAX_SUBSTEPS,
+                  neighbor_skin=NEIGHBOR_SKIN, flock_approximation=FLOCK_APPROXIMATION, seed=SEED)
+
+def make_ui():
+    # Buttons in the order manage_UI() expects them
     a = 140
     b = 10
     c = 50
     d = 10
 
-    button_add_boids = pygame.Rect(a, b, c, d)  # Button to add boids
-    button_remove_boids = pygame.Rect(a+60, b, c, d)  # Button to remove boids
-    button_add_speed = pygame.Rect(a, b+20, c, d)  # Button to increase speed
-    button_remove_speed = pygame.Rect(a+60, b+20, c, d)
-    button_add_force = pygame.Rect(a, b+40, c, d)  # Button to increase force
-    button_remove_force = pygame.Rect(a+60, b+40, c, d)
-    button_add_neighbor_radius = pygame.Rect(a, b+60, c, d)
-    button_remove_neighbor_radius = pygame.Rect(a+60, b+60, c, d)
-    button_add_separation_radius = pygame.Rect(a, b+80, c, d)
-    button_remove_separation_radius = pygame.Rect(a+60, b+80, c, d)
-    button_add_object_separation_radius = pygame.Rect(a, b+100, c, d)
-    button_remove_object_separation_radius = pygame.Rect(a+60, b+100, c, d)
-    button_hatch_worker = pygame.Rect(a+60, b+240, c+40, d)
-    button_hatch_queen = pygame.Rect(a+60, b+260, c+40, d)
-
-    pygame.draw.rect(screen, (255, 255, 255), button_add_boids)
-    pygame.draw.rect(screen, (255, 255, 255), button_remove_boids)
-    pygame.draw.rect(screen, (255, 255, 255), button_add_speed)
-    pygame.draw.rect(screen, (255, 255, 255), button_remove_speed)
-    pygame.draw.rect(screen, (255, 255, 255), button_add_force)
-    pygame.draw.rect(screen, (255, 255, 255), button_remove_force)
-    pygame.draw.rect(screen, (255, 255, 255), button_add_neighbor_radius)
-    pygame.draw.rect(screen, (255, 255, 255), button_remove_neighbor_radius)
-    pygame.draw.rect(screen, (255, 255, 255), button_add_separation_radius)
-    pygame.draw.rect(screen, (255, 255, 255), button_remove_separation_radius)
-    pygame.draw.rect(screen, (255, 255, 255), button_add_object_separation_radius)
-    pygame.draw.rect(screen, (255, 255, 255), button_remove_object_separation_radius)
-    pygame.draw.rect(screen, (255, 255, 255), button_hatch_worker)
-    pygame.draw.rect(screen, (255, 255, 255), button_hatch_queen)
-
-    for button, label in [
-            (button_add_boids, "+"),
-            (button_remove_boids, "-"),
-            (button_add_speed, "+"),
-            (button_remove_speed, "-"),
-            (button_add_force, "+"),
-            (button_remove_force, "-"),
-            (button_add_neighbor_radius, "+"),
-            (button_remove_neighbor_radius, "-"),
-            (button_add_separation_radius, "+"),
-            (button_remove_separation_radius, "-"),
-            (button_add_object_separation_radius, "+"),
-            (button_remove_object_separation_radius, "-")
-        ]:
-            text = font.render(label, True, (0, 0, 0))  # Black text
-            text_rect = text.get_rect(center=button.center)
-            screen.blit(text, text_rect)
-
-    boid_count_text = font.render(f"Ants: {len(boids)}", True, (255, 255, 255))  # White text
-    max_speed_text = font.render(f"Max Speed: {MAX_SPEED}", True, (255, 255, 255))
-    max_force_text = font.render(f"Max Force: {round(MAX_FORCE, 2)}", True, (255, 255, 255))
-    neighbor_radius_text = font.render(f"Neighbor Radius: {NEIGHBOR_RADIUS}", True, (255, 255, 255))
-    separation_radius_text = font.render(f"Separation Radius: {SEPARATION_RADIUS}", True, (255, 255, 255))
-    width_text = font.render(f"Window Width: {WIDTH}", True, (255, 255, 255))
-    height_text = font.render(f"Window Height: {HEIGHT}", True, (255, 255, 255))
-    object_separation_radius_text = font.render(f"Object Separation: {OBJECT_SEPERATION_RADIUS}", True, (255, 255, 255))
-    queens_text = font.render(f"Queens: {QUEENS}", True, (255, 255, 255))
-    larva_text = font.render(f"Larva: {LARVA}", True, (255, 255, 255))
-    food_text = font.render(f"Food: {FOOD}", True, (255, 255, 255))
-    worker_text = font.render(f"Workers: {len(boids)}", True, (255, 255, 255))
-    hatch_worker_text = font.render(f"Hatch Worker for 10 food and 1 larva", True, (255, 255, 255))
-    hatch_queen_text = font.render(f"Hatch Queen for 500 food and 10 larva", True, (255, 255, 255))
-
-    # Draw it on screen at top-left
-    screen.blit(boid_count_text, (10, 10))  # Position: (x=10, y=10)
-    screen.blit(max_speed_text, (10, 30))
-    screen.blit(max_force_text, (10, 50))
-    screen.blit(neighbor_radius_text, (10, 70))
-    screen.blit(separation_radius_text, (10, 90))
-    screen.blit(object_separation_radius_text, (10, 110))
-    screen.blit(width_text, (10, 130))
-    screen.blit(height_text, (10, 150))
-    screen.blit(queens_text, (10, 170))
-    screen.blit(larva_text, (10, 190))
-    screen.blit(food_text, (10, 210))
-    screen.blit(worker_text, (10, 230))
-    screen.blit(hatch_worker_text, (10, 250))
-    screen.blit(hatch_queen_text, (10, 270))
-
-    return [
-        button_add_boids,
-        button_remove_boids,
-        button_add_speed,
-        button_remove_speed,
-        button_add_force,
-        button_remove_force,
-        button_add_neighbor_radius,
-        button_remove_neighbor_radius,
-        button_add_separation_radius,
-        button_remove_separation_radius,
-        button_add_object_separation_radius,
-        button_remove_object_separation_radius,
-        button_hatch_worker,
-        button_hatch_queen,
-    ]
+    panel = UIPanel()
+    panel.add_button(pygame.Rect(a, b, c, d), "+")  # Button to add boids
+    panel.add_button(pygame.Rect(a+60, b, c, d), "-")  # Button to remove boids
+    panel.add_button(pygame.Rect(a, b+20, c, d), "+")  # Button to increase speed
+    panel.add_button(pygame.Rect(a+60, b+20, c, d), "-")
+    panel.add_button(pygame.Rect(a, b+40, c, d), "+")  # Button to increase force
+    panel.add_button(pygame.Rect(a+60, b+40, c, d), "-")
+    panel.add_button(pygame.Rect(a, b+60, c, d), "+")
+    panel.add_button(pygame.Rect(a+60, b+60, c, d), "-")
+    panel.add_button(pygame.Rect(a, b+80, c, d), "+")
+    panel.add_button(pygame.Rect(a+60, b+80, c, d), "-")
+    panel.add_button(pygame.Rect(a, b+100, c, d), "+")
+    panel.add_button(pygame.Rect(a+60, b+100, c, d), "-")
+    panel.add_button(pygame.Rect(a+60, b+240, c+40, d))  # Hatch worker
+    panel.add_button(pygame.Rect(a+60, b+260, c+40, d))  # Hatch queen
+    return panel
+
+ui_panel = make_ui()
+
+def render_UI(screen, world, boids):
+    # Only labels whose text changed are rendered again; the panel itself is
+    # one cached surface
+    ui_panel.set_labels([
+        ((10, 10), f"Ants: {len(boids)}"),
+        ((10, 30), f"Max Speed: {world.max_speed}"),
+        ((10, 50), f"Max Force: {round(world.max_force, 2)}"),
+        ((10, 70), f"Neighbor Radius: {world.neighbor_radius}"),
+        ((10, 90), f"Separation Radius: {world.separation_radius}"),
+        ((10, 110), f"Object Separation: {world.object_separation_radius}"),
+        ((10, 130), f"World Width: {world.width}"),
+        ((10, 150), f"World Height: {world.height}"),
+        ((10, 170), f"Queens: {world.queens}"),
+        ((10, 190), f"Larva: {world.larva}"),
+        ((10, 210), f"Food: {world.food}"),
+        ((10, 230), f"Workers: {len(boids)}"),
+        ((10, 250), "Hatch Worker for 10 food and 1 larva"),
+        ((10, 270), "Hatch Queen for 500 food and 10 larva"),
+    ])
+    ui_panel.draw(screen)
+    return ui_panel.rects()
 
 # Declare mouse_held as a global variable
 mouse_held = False
 last_add_time = 0  # Initialize outside the function
+show_profiler = False  # Toggled with F3
 
-def manage_UI(buttons, boids, movable_objects):
-    global WIDTH, HEIGHT, MAX_SPEED, MAX_FORCE, NEIGHBOR_RADIUS, SEPARATION_RADIUS, OBJECT_SEPERATION_RADIUS, mouse_held, last_add_time, FOOD, LARVA, WORKERS, QUEENS
+def manage_UI(world, buttons, boids, movable_objects, camera, moved_objects):
+    # moved_objects (a set) gets every ball the mouse moves, for the
+    # simulation's culling until its object index is rebuilt
+    global mouse_held, last_add_time, show_profiler
     dragging_object = False  # Flag to check if an object is being dragged
 
     button_add_boids = buttons[0]
@@ -155,14 +161,17 @@ def manage_UI(buttons, boids, movable_objects):
     
     dragging = False
     for event in pygame.event.get():
+        if camera.handle_event(event):
+            continue
         if event.type == pygame.QUIT:
             return False
-        if event.type == pygame.VIDEORESIZE:
-            WIDTH, HEIGHT = event.w, event.h
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+            show_profiler = not show_profiler
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
             mouse_held = True
+            spot = camera.to_world(event.pos)
             for obj in movable_objects:
-                if (obj.position - pygame.Vector2(event.pos)).length() < obj.size:
+                if (obj.position - spot).length() < obj.size:
                     obj.is_dragging = True
                     dragging = True
         elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
@@ -174,7 +183,8 @@ def manage_UI(buttons, boids, movable_objects):
         elif event.type == pygame.MOUSEMOTION:
             for obj in movable_objects:
                 if obj.is_dragging:
-                    obj.position = pygame.Vector2(event.pos)
+                    obj.position = camera.to_world(event.pos)
+                    moved_objects.add(obj)
                     dragging = True
 
     # Get the current time
@@ -185,49 +195,49 @@ def manage_UI(buttons, boids, movable_objects):
         mouse_pos = pygame.mouse.get_pos()
 
         if button_add_boids.collidepoint(mouse_pos):
-            new_boid = Boid(random.randint(0, WIDTH), random.randint(0, HEIGHT))
+            new_boid = Boid(world.rng.randint(0, world.width), world.rng.randint(0, world.height), world)
             boids.append(new_boid)
         elif button_remove_boids.collidepoint(mouse_pos):
             if boids:
                 boids.pop()
         elif button_add_speed.collidepoint(mouse_pos):
-            MAX_SPEED += 1
+            world.max_speed += 1
         elif button_remove_speed.collidepoint(mouse_pos):
-            if MAX_SPEED > 1:
-                MAX_SPEED -= 1
+            if world.max_speed > 1:
+                world.max_speed -= 1
         elif button_add_force.collidepoint(mouse_pos):
-            MAX_FORCE += 0.1
+            world.max_force += 0.1
         elif button_remove_force.collidepoint(mouse_pos):
-            if MAX_FORCE > 0.1:
-                MAX_FORCE -= 0.1
+            if world.max_force > 0.1:
+                world.max_force -= 0.1
         elif button_add_neighbor_radius.collidepoint(mouse_pos):
-            NEIGHBOR_RADIUS += 10
+            world.neighbor_radius += 10
         elif button_remove_neighbor_radius.collidepoint(mouse_pos):
-            if NEIGHBOR_RADIUS > 10:
-                NEIGHBOR_RADIUS -= 10
+            if world.neighbor_radius > 10:
+                world.neighbor_radius -= 10
         elif button_add_separation_radius.collidepoint(mouse_pos):
-            SEPARATION_RADIUS += 10
+            world.separation_radius += 10
         elif button_remove_separation_radius.collidepoint(mouse_pos):
-            if SEPARATION_RADIUS > 10:
-                SEPARATION_RADIUS -= 10
+            if world.separation_radius > 10:
+                world.separation_radius -= 10
         elif button_add_object_separation_radius.collidepoint(mouse_pos):
-            OBJECT_SEPERATION_RADIUS += 10
+            world.object_separation_radius += 10
         elif button_remove_object_separation_radius.collidepoint(mouse_pos):
-            if OBJECT_SEPERATION_RADIUS > 10:
-                OBJECT_SEPERATION_RADIUS -= 10
+            if world.object_separation_radius > 10:
+                world.object_separation_radius -= 10
         elif button_hatch_worker.collidepoint(mouse_pos):
-            if FOOD >= 10 and LARVA >= 1:
-                FOOD -= 10
-                LARVA -= 1
-                WORKERS += 1
-                new_boid = Boid(random.randint(0, WIDTH), random.randint(0, HEIGHT))
+            if world.food >= 10 and world.larva >= 1:
+                world.food -= 10
+                world.larva -= 1
+                world.workers += 1
+                new_boid = Boid(world.rng.randint(0, world.width), world.rng.randint(0, world.height), world)
                 boids.append(new_boid)
         elif button_hatch_queen.collidepoint(mouse_pos):
-            if FOOD >= 500 and LARVA >= 10:
-                FOOD -= 500
-                LARVA -= 10
-                QUEENS += 1
-                new_boid = Boid(random.randint(0, WIDTH), random.randint(0, HEIGHT))
+            if world.food >= 500 and world.larva >= 10:
+                world.food -= 500
+                world.larva -= 10
+                world.queens += 1
+                new_boid = Boid(world.rng.randint(0, world.width), world.rng.randint(0, world.height), world)
                 boids.append(new_boid)
 
         # Update the last action time
@@ -235,9 +245,17 @@ def manage_UI(buttons, boids, movable_objects):
 
     return True
 
+# Ball surfaces (and the ants' stand-in if ant.png won't load), so they are
+# blitted in the same batch as the ants
+shapes = ShapeCache()
+
 class MovableObject:
+    __slots__ = ("position", "previous_position", "velocity", "size", "mass",
+                 "is_dragging", "held_in_goal", "last_goal_time", "object_remains_in_goal_time", "left_in_goal")
+
     def __init__(self, x, y):
         self.position = pygame.Vector2(x, y)
+        self.previous_position = pygame.Vector2(x, y)  # for interpolated drawing
         self.velocity = pygame.Vector2(0, 0)
         self.size = 20  # radius for simplicity
         self.mass = 5
@@ -245,323 +263,579 @@ class MovableObject:
         self.held_in_goal = False
         self.last_goal_time = None
         self.object_remains_in_goal_time = None  # Flag to check if an object remains in the goal for too long
+        self.left_in_goal = False  # True while boids no longer go for it, see track_goal()
         #self.last_goal_time = None  # Track when the object was last in the goal
 
-    def update(self, target_position):
-        global TARGET_HOLD_TIME
+    def update(self, world, target_position, target_radius=40):
+        self.previous_position.update(self.position)
         if not self.is_dragging:
-            self.position += self.velocity
-            self.velocity *= 0.95  # friction / damping
-            if self.position.x <= 0 or self.position.x >= WIDTH:
+            self.position += self.velocity * world.step_scale
+            self.velocity *= 0.95 ** world.step_scale  # friction / damping, 0.95 per reference frame
+            if self.position.x <= 0 or self.position.x >= world.width:
                 self.velocity.x *= -1
                 # Clamp inside bounds
-                self.position.x = max(0, min(self.position.x, WIDTH))
+                self.position.x = max(0, min(self.position.x, world.width))
 
-            if self.position.y <= 0 or self.position.y >= HEIGHT:
+            if self.position.y <= 0 or self.position.y >= world.height:
                 self.velocity.y *= -1
                 # Clamp inside bounds
-                self.position.y = max(0, min(self.position.y, HEIGHT))
-        if self.position == target_position:
+                self.position.y = max(0, min(self.position.y, world.height))
+        # Held once it has stayed inside the goal for world.target_hold_time
+        if self.position.distance_to(target_position) < target_radius:
             if self.last_goal_time is None:
-                self.last_goal_time = pygame.time.get_ticks()
-            if pygame.time.get_ticks() - self.last_goal_time > TARGET_HOLD_TIME:
+                self.last_goal_time = world.sim_time  # when it entered the goal
+            if world.sim_time - self.last_goal_time > world.target_hold_time:
                 self.held_in_goal = True
-            self.last_goal_time = pygame.time.get_ticks()
         else:
+            self.last_goal_time = None
             self.held_in_goal = False
 
-    def apply_force(self, force):
-        if not self.is_dragging:
-            self.velocity += force / self.mass
+    def track_goal(self, world, target_position):
+        # Once per step, before the boids look for objects to go for: an
+        # object back in the goal more than 7 seconds after it first entered
+        # it is left there. Returns "entered" or "left in goal" when that
+        # happens this step, None otherwise.
+        dx = self.position.x - target_position.x
+        dy = self.position.y - target_position.y
+        if dx * dx + dy * dy < 30 * 30:
+            if self.object_remains_in_goal_time is None:
+                self.object_remains_in_goal_time = world.sim_time
+                return "entered"
+            if not self.left_in_goal and world.sim_time - self.object_remains_in_goal_time > 7000:
+                self.left_in_goal = True
+                return "left in goal"
+        else:
+            self.left_in_goal = False
+        return None
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, (255, 255, 0), self.position, self.size)
+    def apply_force(self, world, force):
+        if not self.is_dragging:
+            self.velocity += force * (world.step_scale / self.mass)
+
+    def sprite(self, alpha=1.0, camera=None):
+        # (surface, top-left corner) of the ball alpha of the way from its
+        # previous to its current position, for blit_all()
+        previous, position = self.previous_position, self.position
+        x = previous.x + (position.x - previous.x) * alpha
+        y = previous.y + (position.y - previous.y) * alpha
+        radius = self.size
+        if camera is not None:
+            x = (x - camera.x) * camera.zoom
+            y = (y - camera.y) * camera.zoom
+            radius *= camera.zoom
+        surface, radius = shapes.circle((255, 255, 0), radius)
+        return surface, (x - radius, y - radius)
+
+    def draw(self, screen, alpha=1.0, camera=None):
+        screen.blit(*self.sprite(alpha, camera))
 
 class Boid:
     ant_image = None
     ant_image_path = os.path.join(os.path.dirname(__file__), "ant.png")
-    def __init__(self, x, y):
+    ant_image_failed = False  # Don't retry (and re-print the error) for every boid
+    ant_sprites = None  # RotationCache of ant_image
+    ant_source = None  # the full-size image, scaled down for each zoom level
+    zoomed_sprites = {}  # camera zoom level -> RotationCache at that zoom
+    ant_size = 32
+    # No per-instance __dict__ (the class attributes above are shared), so
+    # each ant in a large colony takes less memory
+    __slots__ = ("position", "velocity", "acceleration", "previous_position",
+                 "color", "signal_time", "goal_location", "has_received")
+
+    def __init__(self, x, y, world):
         # Initialize position and velocity
         self.position = pygame.Vector2(x, y)
-        angle = random.uniform(0, 2 * math.pi)
-        self.velocity = pygame.Vector2(math.cos(angle), math.sin(angle)) * MAX_SPEED
+        angle = world.rng.uniform(0, 2 * math.pi)
+        self.velocity = pygame.Vector2(math.cos(angle), math.sin(angle)) * world.max_speed
         self.acceleration = pygame.Vector2(0, 0)
+        self.previous_position = pygame.Vector2(self.position)  # for interpolated drawing
         self.color = (255, 0, 0)
-        self.signal_time = pygame.time.get_ticks()
-        self.goal_location = pygame.Vector2(WIDTH // 2, HEIGHT // 2)
+        self.signal_time = world.sim_time
+        self.goal_location = pygame.Vector2(world.width // 2, world.height // 2)
         self.has_received = False  # Flag to check if boid has received a message
-        # Load ant image once for all boids
-        if Boid.ant_image is None:
+        # Load ant image once for all boids (needs a display to convert to)
+        if Boid.ant_image is None and not Boid.ant_image_failed and pygame.display.get_surface() is not None:
             try:
                 img = pygame.image.load(Boid.ant_image_path).convert_alpha()
-                Boid.ant_image = pygame.transform.smoothscale(img, (32, 32))
+                Boid.ant_source = img
+                Boid.ant_image = pygame.transform.smoothscale(img, (Boid.ant_size, Boid.ant_size))
+                Boid.ant_sprites = RotationCache(Boid.ant_image, ANT_ROTATION_STEP)
             except Exception as e:
                 print(f"Error loading ant.png: {e}")
                 Boid.ant_image = None
-
-    def update(self, blocks, WIDTH, HEIGHT):
-        # Update velocity and position
-        self.velocity += self.acceleration
-        if self.velocity.length() > MAX_SPEED:
-            self.velocity.scale_to_length(MAX_SPEED)
-        self.position += self.velocity
-        self.acceleration *= 0
+                Boid.ant_image_failed = True
+
+    def update(self, world):
+        # Update velocity and position over this step. Done component by
+        # component, in place: every pygame.Vector2 temporary or method call
+        # is a heap allocation, and this runs for every boid every step.
+        position = self.position
+        velocity = self.velocity
+        acceleration = self.acceleration
+        scale = world.step_scale
+        self.previous_position.x = position.x
+        self.previous_position.y = position.y
+        velocity.x += acceleration.x * scale
+        velocity.y += acceleration.y * scale
+        speed = math.hypot(velocity.x, velocity.y)
+        if speed > world.max_speed:
+            velocity *= world.max_speed / speed
+        position.x += velocity.x * scale
+        position.y += velocity.y * scale
+        acceleration.x = acceleration.y = 0.0
         
-        if pygame.time.get_ticks() - self.signal_time > 100:
+        if world.sim_time - self.signal_time > 100:
             self.color = (255, 255, 255)
 
         # Screen bouncing
-        if self.position.x <= 0 or self.position.x >= WIDTH:
+        if self.position.x <= 0 or self.position.x >= world.width:
             self.velocity.x *= -1
             # Clamp inside bounds
-            self.position.x = max(0, min(self.position.x, WIDTH))
+            self.position.x = max(0, min(self.position.x, world.width))
 
-        if self.position.y <= 0 or self.position.y >= HEIGHT:
+        if self.position.y <= 0 or self.position.y >= world.height:
             self.velocity.y *= -1
             # Clamp inside bounds
-            self.position.y = max(0, min(self.position.y, HEIGHT))
-        
-        for block in blocks:
-            block_rect = block.get_rect()
-            boid_rect = pygame.Rect(self.position.x, self.position.y, 5, 5)  # A small rect for collision
-            if boid_rect.colliderect(block_rect):
-                # Simple bounce: reverse direction
-                # You can get fancier with angle of incidence/reflection later
-                if block_rect.left <= self.position.x <= block_rect.right:
-                    self.velocity.y *= -1
-                if block_rect.top <= self.position.y <= block_rect.bottom:
-                    self.velocity.x *= -1
+            self.position.y = max(0, min(self.position.y, world.height))
+
+    def bounce_off_blocks(self, world):
+        # Bounce off blocks, looked up in the obstacle bitmap (a small 5x5
+        # rect for collision). Its own pass after update(), so the profiler
+        # shows block collisions apart from moving the boids.
+        flip_x, flip_y = world.obstacle_map.bounce(self.position)
+        if flip_y:
+            # Simple bounce: reverse direction
+            # You can get fancier with angle of incidence/reflection later
+            self.velocity.y *= -1
+        if flip_x:
+            self.velocity.x *= -1
 
     def apply_force(self, force):
         self.acceleration += force
 
-    def align(self, boids):
+    def align(self, world, boids):
         steering = pygame.Vector2(0, 0)
         total = 0
         for boid in boids:
-            if boid != self and self.position.distance_to(boid.position) < NEIGHBOR_RADIUS:
+            if boid != self and self.position.distance_to(boid.position) < world.neighbor_radius:
                 steering += boid.velocity
                 total += 1
         if total > 0:
             steering /= total
-            steering = (steering.normalize() * MAX_SPEED) - self.velocity
-            if steering.length() > MAX_FORCE:
-                steering.scale_to_length(MAX_FORCE)
+            steering = (steering.normalize() * world.max_speed) - self.velocity
+            if steering.length() > world.max_force:
+                steering.scale_to_length(world.max_force)
         return steering
 
-    def cohesion(self, boids):
+    def cohesion(self, world, boids):
         steering = pygame.Vector2(0, 0)
         total = 0
         for boid in boids:
-            if boid != self and self.position.distance_to(boid.position) < NEIGHBOR_RADIUS:
+            if boid != self and self.position.distance_to(boid.position) < world.neighbor_radius:
                 steering += boid.position
                 total += 1
         if total > 0:
             steering /= total
-            steering = (steering - self.position).normalize() * MAX_SPEED - self.velocity
-            if steering.length() > MAX_FORCE:
-                steering.scale_to_length(MAX_FORCE)
+            steering = (steering - self.position).normalize() * world.max_speed - self.velocity
+            if steering.length() > world.max_force:
+                steering.scale_to_length(world.max_force)
             return steering
         return pygame.Vector2(0, 0)
 
-    def separation(self, boids, blocks):
+    def separation(self, world, boids, blocks):
         steering = pygame.Vector2(0, 0)
         total = 0
         for boid in boids:
             distance = self.position.distance_to(boid.position)
-            if boid != self and distance < SEPARATION_RADIUS:
+            if boid != self and distance < world.separation_radius:
                 diff = self.position - boid.position
                 if distance != 0:
                     diff /= distance
                 steering += diff
                 total += 1
-        # After self.position += self.velocity
-        boid_rect = pygame.Rect(self.position.x, self.position.y, 5, 5)  # A small rect for collision
-        
-        for block in blocks:
-            distance = self.position.distance_to(block.position)
-            if distance < OBJECT_SEPERATION_RADIUS:
-                diff = self.position - block.position
-                if distance != 0:
-                    diff /= distance
-                steering += diff
-                total += 1
-            block = block.get_rect()
-        
+        # Blocks within the object separation radius, summed up in advance by
+        # the obstacle map
+        away_x, away_y, count = world.obstacle_map.repulsion(self.position)
+        steering += pygame.Vector2(away_x, away_y)
+        total += count
+
         if total > 0:
             steering /= total
         if steering.length() > 0:
-            steering = steering.normalize() * MAX_SPEED - self.velocity
-            if steering.length() > MAX_FORCE:
-                steering.scale_to_length(MAX_FORCE)
+            steering = steering.normalize() * world.max_speed - self.velocity
+            if steering.length() > world.max_force:
+                steering.scale_to_length(world.max_force)
         return steering
 
-    def broadcast(self, boids, blocks, objects, goal_location):
-        for boid in boids:
-            if boid != self and not boid.has_received and self.position.distance_to(boid.position) < BROADCAST_RADIUS:
-                boid.recieve(boids, blocks, objects, goal_location)
-
-    def recieve(self, boids, blocks, objects, goal_location):
-        if not self.has_received:
-            self.has_received = True
-            self.color = (0, 255, 0)
-            self.broadcast(boids, blocks, objects, goal_location)
-            self.goal_location = goal_location
-            self.signal_time = pygame.time.get_ticks()
-            self.attract_to_object(boids, blocks, objects, goal_location)
-            self.apply_force(self.move_to_location(self.goal_location))
-            self.flock(boids, blocks, objects, self.goal_location)
-
-    def scatter(self, boids, blocks, objects, target_position):
-        self.apply_force(pygame.Vector2(random.uniform(-1, 1), random.uniform(-1, 1)) * MAX_FORCE)
-        self.push_object(objects, target_position)
-        self.apply_force(self.attract_to_object(boids, blocks, objects, target_position))
-
-    def push_object(self, objects, goal):
-        for obj in objects:
-            to_object = obj.position - self.position
-            if to_object.length() < 30:
+    def broadcast(self, world, boids, blocks, objects, goal_location):
+        # Queue the message; Simulation.propagate() spreads it from boid to
+        # boid within the broadcast radius once the whole swarm has scattered
+        world.broadcasts.send(self, goal_location)
+
+    def recieve(self, world, boids, blocks, objects, goal_location):
+        # Called by the broadcast wave, which has already set has_received
+        # and passes the message on to this boid's neighbors
+        self.color = (0, 255, 0)
+        self.goal_location = goal_location
+        self.signal_time = world.sim_time
+        self.apply_force(self.move_to_location(world, self.goal_location))
+        self.flock(world, boids, blocks, objects, self.goal_location)
+
+    def scatter(self, world, boids, blocks, objects, target_position):
+        # Random wander, added component-wise without a temporary vector
+        self.acceleration.x += world.rng.uniform(-1, 1) * world.max_force
+        self.acceleration.y += world.rng.uniform(-1, 1) * world.max_force
+        self.push_object(world, objects, target_position)
+        self.apply_force(self.attract_to_object(world, boids, blocks, objects, target_position))
+
+    def push_object(self, world, objects, goal):
+        position = self.position
+        for obj in world.object_index.near(position, 30):
+            # Squared distance from components, no temporary vector
+            dx = obj.position.x - position.x
+            dy = obj.position.y - position.y
+            if dx * dx + dy * dy < 30 * 30:
                 # Modify this section in swarm-soccer.py
                 if (goal - obj.position).length() != 0:
                     push_dir = (goal - obj.position).normalize()
                 else:
                     push_dir = pygame.Vector2(0, 0)  # Fixed: Use pygame.Vector2 instead of Vector2
-                force = push_dir * OBJECT_PUSH_FORCE
-                obj.apply_force(force)
+                force = push_dir * world.object_push_force
+                obj.apply_force(world, force)
     
-    def move_to_location(self, location):
+    def move_to_location(self, world, location):
+        if location == self.position:
+            return pygame.Vector2(0, 0)  # Already there (e.g. both clamped into a corner)
         direction = (location - self.position).normalize()
-        steer = direction * MAX_SPEED - self.velocity
-        if steer.length() > MAX_FORCE:
-            steer.scale_to_length(MAX_FORCE)
+        steer = direction * world.max_speed - self.velocity
+        if steer.length() > world.max_force:
+            steer.scale_to_length(world.max_force)
         return steer
 
-    def attract_to_object(self, boids, blocks, objects, target_position):
-        closest_object = None
-        min_distance = float('inf')
-
-        # Find the closest object
-        for obj in objects:
-            # Check if the object is in the goal
-            if obj.position.distance_to(target_position) < 30:
-                if obj.object_remains_in_goal_time is None:
-                    #print(f"None")
-                    obj.object_remains_in_goal_time = pygame.time.get_ticks()
-                    print("Object entered the goal")
-                elif pygame.time.get_ticks() - obj.object_remains_in_goal_time > 7000:
-                    print(f"Skipping object {obj.position} because it remains in the goal for too long")
-                    continue  # Permanently skip this object
-
-            distance = self.position.distance_to(obj.position)
-            if distance < min_distance:
-                min_distance = distance
-                closest_object = obj
-
-        # If a closest object is found and within the attraction radius
-        if closest_object and min_distance < ATTRACTION_RADIUS:
-            self.broadcast(boids, blocks, objects, closest_object.position)
-            return self.move_to_location(closest_object.position)
+    def attract_to_object(self, world, boids, blocks, objects, target_position):
+        # The closest object within the attraction radius, skipping the ones
+        # left in the goal (see MovableObject.track_goal)
+        closest_object = world.object_index.nearest(self.position, world.attraction_radius)
+        if closest_object is not None:
+            self.broadcast(world, boids, blocks, objects, closest_object.position)
+            return self.move_to_location(world, closest_object.position)
 
         return pygame.Vector2(0, 0)
 
-    def resolve_collision_with_ball(self, objects):
-        for ball in objects:
-            distance = self.position.distance_to(ball.position)
+    def resolve_collision_with_ball(self, world, objects):
+        # Being pushed out of one ball moves the boid by up to one ball radius
+        # plus its own, possibly into a ball that far away again
+        index = world.object_index
+        for ball in index.near(self.position, 2 * (index.largest_size + 5)):
+            distance = math.hypot(self.position.x - ball.position.x, self.position.y - ball.position.y)
             overlap = ball.size + 5 - distance  # 5 is boid "radius"
 
-            if overlap > 0:
+            if overlap > 0 and distance > 0:
                 # Push boid away from ball
                 push_dir = (self.position - ball.position).normalize()
                 self.position += push_dir * overlap  # move boid out
                 self.velocity.reflect_ip(push_dir)  # reflect direction
 
                 # Optional: also apply a force to the ball (Newton's Third Law)
-                ball.apply_force(-push_dir * 0.5)  # tweak force amount
-
-
-    def flock(self, boids, blocks, objects, target_position):
-        # Apply the three main forces
-        alignment = self.align(boids)
-        cohesion = self.cohesion(boids)
-        separation = self.separation(boids, blocks)
-
-        # Weigh the forces
-        self.apply_force(alignment * 1.0)
-        self.apply_force(cohesion * 1.0)
-        self.apply_force(separation * 1.5)
-
-    def draw(self, screen):
-        # Draw the ant sprite, rotated to match velocity direction
-        if Boid.ant_image:
-            angle = math.degrees(math.atan2(-self.velocity.y, self.velocity.x)) - 90
-            rotated = pygame.transform.rotate(Boid.ant_image, angle)
-            rect = rotated.get_rect(center=(self.position.x, self.position.y))
-            screen.blit(rotated, rect)
+                ball.apply_force(world, -push_dir * 0.5)  # tweak force amount
+
+
+    def flock(self, world, boids, blocks, objects, target_position):
+        if world.flock_approximation is not None:
+            # Alignment and cohesion from the per-cell sums of nearby boids
+            ax, ay, cx, cy, sx, sy = approximate_flock_steering(
+                self, world.cell_aggregates, world.obstacle_map, world.neighbor_radius, world.separation_radius,
+                world.max_speed, world.max_force, world.flock_approximation)
+        else:
+            # Only boids in this boid's neighbor list can be within either radius
+            neighbors = world.neighbor_list.get(self)
+            if neighbors is None:  # not there when the lists were last built
+                neighbors = world.neighbor_grid.query(self.position, max(world.neighbor_radius, world.separation_radius))
+
+            # Apply the three main forces, computed together in one neighbor pass
+            ax, ay, cx, cy, sx, sy = flock_steering(
+                self, neighbors, world.obstacle_map, world.neighbor_radius, world.separation_radius,
+                world.max_speed, world.max_force)
+
+        # Weigh the forces, added straight onto the acceleration
+        acceleration = self.acceleration
+        acceleration.x += ax * 1.0 + cx * 1.0 + sx * 1.5
+        acceleration.y += ay * 1.0 + cy * 1.0 + sy * 1.5
+
+    @staticmethod
+    def sprites_at(camera):
+        # The rotation cache for the camera's zoom level, scaled from the
+        # full-size image the first time that level is used
+        if camera is None or camera.level == 0 or not Boid.ant_sprites:
+            return Boid.ant_sprites
+        sprites = Boid.zoomed_sprites.get(camera.level)
+        if sprites is None:
+            side = max(2, round(Boid.ant_size * camera.zoom))
+            image = pygame.transform.smoothscale(Boid.ant_source, (side, side))
+            sprites = Boid.zoomed_sprites[camera.level] = RotationCache(image, ANT_ROTATION_STEP)
+        return sprites
+
+    def sprite(self, alpha=1.0, camera=None, sprites=None):
+        # (surface, top-left corner) of the ant sprite, rotated to match
+        # velocity direction, alpha of the way from its previous to its
+        # current position, for blit_all(). Simulation.draw passes the
+        # sprites for the camera's zoom, looked up once per frame. Done
+        # component by component: this runs for every ant in view every frame.
+        previous, position, velocity = self.previous_position, self.position, self.velocity
+        x = previous.x + (position.x - previous.x) * alpha
+        y = previous.y + (position.y - previous.y) * alpha
+        if camera is not None:
+            x = (x - camera.x) * camera.zoom
+            y = (y - camera.y) * camera.zoom
+        if sprites is None:
+            sprites = Boid.sprites_at(camera)
+        if sprites:
+            angle = math.degrees(math.atan2(-velocity.y, velocity.x)) - 90
+            rotated, half_width, half_height = sprites.get(angle)
+            return rotated, (x - half_width, y - half_height)
+        # fallback: a red circle
+        surface, radius = shapes.circle((255, 0, 0), 8 if camera is None else 8 * camera.zoom)
+        return surface, (x - radius, y - radius)
+
+    def draw(self, screen, alpha=1.0, camera=None, sprites=None):
+        screen.blit(*self.sprite(alpha, camera, sprites))
+
+
+class Simulation:
+    # The colony without any window or event handling: boids, movable
+    # objects and the food/larva economy. main() steps it with the real frame
+    # time; headless.py steps it as fast as the CPU allows. Settings, clock
+    # and economy live in self.world, so simulations are independent.
+    def __init__(self, num_boids=NUM_BOIDS, world=None, num_objects=NUM_OBJECTS):
+        self.world = world = world if world is not None else default_world()
+        self.boids = [Boid(world.rng.randint(0, world.width), world.rng.randint(0, world.height), world) for _ in range(num_boids)]
+        self.objects = [MovableObject(world.rng.randint(0, world.width), world.rng.randint(0, world.height))
+                        for _ in range(num_objects)]
+        self.blocks = []
+
+        # Target position
+        self.target_position = pygame.Vector2(world.width // 2, world.height // 2)
+        self.target_radius = 40
+
+        self.one_second_ticker = world.sim_time
+        self.frames = 0
+        # Called as on_goal(obj, event) for the events of track_goal(); the
+        # simulation itself never prints, main() reports them
+        self.on_goal = None
+
+        # Dark green field with the base and the blocks, redrawn only when
+        # they change
+        self.background = StaticLayer((0, 100, 0), self.draw_base)
+        # Draws big colonies as pixels instead of sprites
+        self.splats = SplatRenderer(LOD_AGENTS, LOD_ZOOM_LEVEL, LOD_STREAK)
+        # Balls the mouse moved since the object index was last built,
+        # filled in by manage_UI()
+        self.moved_by_mouse = set()
+
+        self.timestep = FixedTimestep(world.sim_step_ms, world.max_substeps)
+
+        # Named parts of a step, in order, each timed by the profiler
+        self.profiler = FrameProfiler()
+        self.phases = [
+            ("scatter", self.scatter),
+            ("broadcast", self.propagate),
+            ("update", self.update),
+            ("blocks", self.bounce_off_blocks),
+            ("collisions", self.resolve_collisions),
+            ("objects", self.update_objects),
+            ("economy", self.update_economy),
+        ]
+
+    def new_boid(self):
+        # An ant at a random spot in this simulation's world
+        world = self.world
+        return Boid(world.rng.randint(0, world.width), world.rng.randint(0, world.height), world)
+
+    def step(self, dt=None):
+        # Advance one step of dt ms (default: the world's sim_step_ms) as its
+        # own profiler frame; callers can time more phases (drawing, UI) into
+        # it. headless.py and benchmark.py step the simulation this way.
+        self.profiler.begin_frame()
+        self.substep(self.world.sim_step_ms if dt is None else dt)
+
+    def advance(self, frame_ms):
+        # Advance by the real time of one rendered frame, in fixed steps of
+        # sim_step_ms (see FixedTimestep). Returns the number of steps run;
+        # self.timestep.alpha is what draw() interpolates with.
+        self.profiler.begin_frame()
+        return self.timestep.advance(frame_ms, self.substep)
+
+    def substep(self, dt):
+        # Motion scales with dt, so speeds and forces mean the same at any
+        # step length; dt also advances the clock used by timers and the economy.
+        world = self.world
+        world.sim_time += dt
+        world.step_scale = dt / REFERENCE_STEP_MS
+        self.frames += 1
+        for name, phase in self.phases:
+            with self.profiler.phase(name):
+                phase()
+
+    def scatter(self):
+        world, boids = self.world, self.boids
+        self.index_objects()
+        # Index boids once so every flock() call sees the same frame
+        world.neighbor_grid.rebuild(boids, max(world.neighbor_radius, world.separation_radius), world.width, world.height)
+        if world.flock_approximation is not None:
+            world.cell_aggregates.rebuild(boids, cell_size_for(world.neighbor_radius), world.width, world.height)
         else:
-            # fallback: draw a red circle
-            pygame.draw.circle(screen, (255,0,0), (int(self.position.x), int(self.position.y)), 8)
+            world.neighbor_list.update(boids, max(world.neighbor_radius, world.separation_radius),
+                                       world.neighbor_skin)
+        world.obstacle_map.sync(self.blocks, world.width, world.height, world.object_separation_radius)
+        for boid in boids:
+            boid.scatter(world, boids, self.blocks, self.objects, self.target_position)
+
+    def index_objects(self):
+        # The once-per-step object pass: goal bookkeeping, then the index the
+        # boids find objects with until the next step
+        world = self.world
+        for obj in self.objects:
+            event = obj.track_goal(world, self.target_position)
+            if event is not None and self.on_goal is not None:
+                self.on_goal(obj, event)
+        targets = [obj for obj in self.objects if not obj.left_in_goal]
+        world.object_index.rebuild(self.objects, targets, world.attraction_radius, world.width, world.height)
+        self.moved_by_mouse.clear()
+
+    def propagate(self):
+        world, boids, blocks, objects = self.world, self.boids, self.blocks, self.objects
+        world.broadcasts.propagate(world.neighbor_grid, world.broadcast_radius,
+                                   lambda boid, goal_location: boid.recieve(world, boids, blocks, objects, goal_location))
+
+    def update(self):
+        world = self.world
+        for boid in self.boids:
+            boid.update(world)
+            boid.has_received = False  # Reset the flag after each update
+
+    def bounce_off_blocks(self):
+        world = self.world
+        for boid in self.boids:
+            boid.bounce_off_blocks(world)
+
+    def resolve_collisions(self):
+        for boid in self.boids:
+            boid.resolve_collision_with_ball(self.world, self.objects)
+
+    def update_objects(self):
+        for obj in self.objects:
+            obj.update(self.world, self.target_position, self.target_radius)
+
+    def update_economy(self):
+        world = self.world
+        if world.sim_time - self.one_second_ticker >= 1000:
+            world.larva += world.queens*2 # Each queen produces 2 larva per second
+            world.food += world.workers # Each worker brings in 1 food per second
+            self.one_second_ticker = world.sim_time
+
+    def draw_base(self, screen, camera=None):
+        # Draw a black filled circle in the middle of the world as the base
+        base_center = pygame.Vector2(self.world.width // 2, self.world.height // 2)
+        base_radius = 40
+        if camera is not None:
+            base_center = camera.to_screen(base_center)
+            base_radius *= camera.zoom
+        pygame.draw.circle(screen, (0, 0, 0), base_center, base_radius)  # filled black # Draw base
+
+    def draw_background(self, screen, camera=None):
+        # Replaces screen.fill(): the field, the base and all blocks in one blit
+        self.background.draw(screen, self.blocks, camera)
+
+    def visible(self, camera):
+        # The boids and objects in the camera's view, from the grids built
+        # for this step instead of going through every one. Those have them
+        # where the step started; the margins cover how far they have moved
+        # since (for boids, including being pushed out of a ball) and their
+        # size. Balls the mouse moved since the last step (moved_by_mouse)
+        # can be any distance from where the index has them, so those are
+        # always included.
+        world = self.world
+        index = world.object_index
+        boid_margin = world.max_speed * world.step_scale + index.largest_size + 5 + Boid.ant_size
+        object_margin = (index.top_speed + world.max_speed) * world.step_scale + index.largest_size
+        boids = world.neighbor_grid.query_rect(*camera.viewport(boid_margin))
+        objects = index.in_rect(*camera.viewport(object_margin))
+        if self.moved_by_mouse:
+            found = set(objects)
+            objects.extend(obj for obj in self.moved_by_mouse if obj not in found)
+        return boids, objects
+
+    def draw(self, screen, alpha=1.0, camera=None):
+        # alpha interpolates between the last two steps (1.0 = latest). With
+        # a camera, only what is in its view is drawn. Too many ants, or too
+        # far zoomed out, and they are splatted as pixels instead of sprites.
+        if camera is None:
+            boids, objects = self.boids, self.objects
+        else:
+            boids, objects = self.visible(camera)
+        # Everything else goes out in one blit_all() call
+        splats = self.splats
+        if splats.wanted(len(boids), camera) and splats.draw(screen, *boid_arrays(boids, alpha), camera):
+            pairs = []
+        else:
+            sprites = Boid.sprites_at(camera)
+            pairs = [boid.sprite(alpha, camera, sprites) for boid in boids]
+        pairs.extend([obj.sprite(alpha, camera) for obj in objects])
+        blit_all(screen, pairs)
+
+def report_goal(obj, event):
+    if event == "entered":
+        print("Object entered the goal")
+    else:
+        print(f"Skipping object {obj.position} because it remains in the goal for too long")
+
 
 def main():
-    global NUM_BOIDS, MAX_SPEED, MAX_FORCE, NEIGHBOR_RADIUS, SEPARATION_RADIUS, WIDTH, HEIGHT, OBJECT_SEPERATION_RADIUS, OBJECTS_IN_GOAL, LARVA, QUEENS, FOOD
     pygame.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
     pygame.display.set_caption("Swarm Simulation")
     clock = pygame.time.Clock()
-    last_add_time = pygame.time.get_ticks()
-    init_goal_time = pygame.time.get_ticks()
-
-    # Create boids
-    boids = [Boid(random.randint(0, WIDTH), random.randint(0, HEIGHT)) for _ in range(NUM_BOIDS)]
-    movable_object_1 = MovableObject(random.randint(0, WIDTH), random.randint(0, HEIGHT))
-    movable_object_2 = MovableObject(random.randint(0, WIDTH), random.randint(0, HEIGHT))
-    movable_object_3 = MovableObject(random.randint(0, WIDTH), random.randint(0, HEIGHT))
-
-    objects = [movable_object_1, movable_object_2, movable_object_3]
-    blocks = []
-
-    # Target position
-    target_position = pygame.Vector2(WIDTH // 2, HEIGHT // 2)
-    target_radius = 40
 
-    one_second_ticker = pygame.time.get_ticks()
+    sim = Simulation()
+    sim.on_goal = report_goal
+    camera = Camera(WIDTH, HEIGHT, sim.world.width, sim.world.height)
+    camera.center_on(sim.world.width / 2, sim.world.height / 2)
+    recorder = TrajectoryRecorder(RECORD_PATH, sim.world) if RECORD_PATH else None
+    telemetry = TelemetryWriter(TELEMETRY_PATH, every=TELEMETRY_EVERY) if TELEMETRY_PATH else None
 
     running = True
+    frame_ms = 1000 / 30
     while running:
-        screen.fill((0, 100, 0))  # RGB for dark green
-        
-        # Draw a black filled circle in the middle of the screen as the base
-        base_center = pygame.Vector2(WIDTH // 2, HEIGHT // 2)
-        base_radius = 40
-        pygame.draw.circle(screen, (0, 0, 0), base_center, base_radius)  # filled black # Draw base
-        
-        buttons = render_UI(screen, boids)
-        running = manage_UI(buttons, boids, objects)
-
-        # Update and draw boids
-        for boid in boids:
-            boid.scatter(boids, blocks, objects, target_position)
-            boid.update(blocks, WIDTH, HEIGHT)
-            boid.resolve_collision_with_ball(objects)
-            boid.draw(screen)
-            boid.has_received = False  # Reset the flag after each update
-        
-        for block in blocks:
-            block.draw(screen)
-        
-        for obj in objects:
-            obj.update(target_position)
-            obj.draw(screen)
-        
-        now = pygame.time.get_ticks()
-        if now - one_second_ticker >= 1000:
-            LARVA += QUEENS*2 # Each queen produces 2 larva per second
-            FOOD += WORKERS # Each worker brings in 1 food per second
-            one_second_ticker = now
-    
+        # The background and the UI come before advance(), which starts the
+        # profiler's frame, so they are timed here and added after it
+        draw_start = time.perf_counter()
+        sim.draw_background(screen, camera)
+        background_time = time.perf_counter() - draw_start
+
+        ui_start = time.perf_counter()
+        buttons = render_UI(screen, sim.world, sim.boids)
+        running = manage_UI(sim.world, buttons, sim.boids, sim.objects, camera, sim.moved_by_mouse)
+        ui_time = time.perf_counter() - ui_start
+
+        if sim.advance(frame_ms) and recorder is not None:
+            recorder.record(sim)
+        sim.profiler.add("draw", background_time)
+        sim.profiler.add("ui", ui_time)
+        with sim.profiler.phase("draw"):
+            sim.draw(screen, sim.timestep.alpha, camera)
+
+        if show_profiler:
+            sim.profiler.draw(screen)
 
         pygame.display.flip()
-        clock.tick(30)
-
+        frame_ms = clock.tick(30)
+        if telemetry is not None and telemetry.due():
+            telemetry.submit(sample(sim, frame_ms))
+
+    if recorder is not None:
+        recorder.close()
+    if telemetry is not None:
+        telemetry.close()
     pygame.quit()
 if __name__ == "__main__":
     main()
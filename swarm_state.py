@@ -0,0 +1,332 @@
+import numpy as np
+import pygame
+
+BOID_SIZE = 5  # side of the small collision rect used by Boid.update
+BLOCK_SIZE = 20
+
+
+def neighbor_pairs(points, targets, radius, skip_self):
+    # All (i, j) with |points[i] - targets[j]| < radius, found by bucketing the
+    # targets into radius-sized cells and only comparing against the 3x3
+    # block of cells around each point. Returns i, j, points[i] - targets[j]
+    # and the distances.
+    empty = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp),
+             np.empty((0, 2)), np.empty(0))
+    if len(points) == 0 or len(targets) == 0 or radius <= 0:
+        return empty
+
+    origin = np.minimum(points.min(axis=0), targets.min(axis=0))
+    target_cells = np.floor((targets - origin) / radius).astype(np.int64)
+    point_cells = np.floor((points - origin) / radius).astype(np.int64)
+    rows = int(max(target_cells[:, 1].max(), point_cells[:, 1].max())) + 3
+
+    target_keys = target_cells[:, 0] * rows + target_cells[:, 1]
+    order = np.argsort(target_keys, kind="stable")
+    sorted_keys = target_keys[order]
+
+    found_i, found_j, found_dx, found_dy = [], [], [], []
+    point_index = np.arange(len(points), dtype=np.int32)
+    order = order.astype(np.int32)
+    px, py = points[:, 0], points[:, 1]
+    tx, ty = targets[:, 0], targets[:, 1]
+    radius_sq = radius * radius
+    for dx in (-1, 0, 1):
+        # The three cells (col + dx, row - 1 .. row + 1) are adjacent in the
+        # sorted order, so each column of the 3x3 block is one slice.
+        keys = (point_cells[:, 0] + dx) * rows + point_cells[:, 1]
+        start = np.searchsorted(sorted_keys, keys - 1, side="left")
+        counts = np.searchsorted(sorted_keys, keys + 1, side="right") - start
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        i = np.repeat(point_index, counts)
+        first = np.repeat(np.cumsum(counts) - counts - start, counts)
+        j = order[np.arange(total) - first]
+        diff_x = px[i] - tx[j]
+        diff_y = py[i] - ty[j]
+        keep = diff_x * diff_x + diff_y * diff_y < radius_sq
+        if skip_self:
+            keep &= i != j
+        found_i.append(i[keep])
+        found_j.append(j[keep])
+        found_dx.append(diff_x[keep])
+        found_dy.append(diff_y[keep])
+
+    if not found_i:
+        return empty
+    diff = np.stack([np.concatenate(found_dx), np.concatenate(found_dy)], axis=1)
+    return (np.concatenate(found_i), np.concatenate(found_j), diff,
+            np.sqrt(np.einsum("ij,ij->i", diff, diff)))
+
+
+def sum_rows(index, values, n):
+    # Per-agent sums of an (K, 2) array of pair values. bincount gives ints
+    # back when there are no pairs, hence the cast.
+    return np.stack([np.bincount(index, values[:, 0], n),
+                     np.bincount(index, values[:, 1], n)], axis=1).astype(float)
+
+
+def limit(vectors, max_length):
+    # Row-wise version of Vector2.scale_to_length for rows longer than max_length
+    lengths = np.sqrt(np.einsum("ij,ij->i", vectors, vectors))
+    too_long = lengths > max_length
+    vectors[too_long] *= (max_length / lengths[too_long])[:, None]
+    return vectors
+
+
+def steer_towards(directions, velocities, max_speed, max_force):
+    # normalize(direction) * max_speed - velocity, clamped to max_force.
+    # Rows with a zero direction give no steering, like flock_forces().
+    lengths = np.sqrt(np.einsum("ij,ij->i", directions, directions))
+    steering = np.zeros_like(directions)
+    moving = lengths > 0
+    steering[moving] = directions[moving] / lengths[moving, None] * max_speed - velocities[moving]
+    return limit(steering, max_force)
+
+
+class BoidView:
+    # Boid-shaped handle onto one row of a SwarmState, so code written for
+    # Boid objects (drawing, UI) keeps working. Reading a vector returns a
+    # copy; assigning (including +=) writes back into the arrays. draw() uses
+    # the draw function the state was created with (normally Boid.draw).
+    __slots__ = ("state", "index")
+
+    def __init__(self, state, index):
+        self.state = state
+        self.index = index
+
+    @property
+    def position(self):
+        return pygame.Vector2(*self.state.positions[self.index])
+
+    @position.setter
+    def position(self, value):
+        self.state.positions[self.index] = tuple(value)
+
+    @property
+    def previous_position(self):
+        # Position before the last update(), for interpolated drawing
+        return pygame.Vector2(*self.state.previous_positions[self.index])
+
+    @property
+    def velocity(self):
+        return pygame.Vector2(*self.state.velocities[self.index])
+
+    @velocity.setter
+    def velocity(self, value):
+        self.state.velocities[self.index] = tuple(value)
+
+    @property
+    def acceleration(self):
+        return pygame.Vector2(*self.state.accelerations[self.index])
+
+    @acceleration.setter
+    def acceleration(self, value):
+        self.state.accelerations[self.index] = tuple(value)
+
+    @property
+    def color(self):
+        return tuple(int(c) for c in self.state.colors[self.index])
+
+    @color.setter
+    def color(self, value):
+        self.state.colors[self.index] = value
+
+    @property
+    def signal_time(self):
+        return int(self.state.signal_times[self.index])
+
+    @signal_time.setter
+    def signal_time(self, value):
+        self.state.signal_times[self.index] = value
+
+    @property
+    def has_received(self):
+        return bool(self.state.received[self.index])
+
+    @has_received.setter
+    def has_received(self, value):
+        self.state.received[self.index] = value
+
+    def apply_force(self, force):
+        self.state.accelerations[self.index] += tuple(force)
+
+    def draw(self, screen, alpha=1.0, camera=None):
+        self.state.draw_boid(self, screen, alpha, camera)
+
+
+class SwarmState:
+    # Struct-of-arrays swarm: one row per agent in contiguous NumPy arrays,
+    # with every flocking rule and the integration step done as batch array
+    # operations. Behaves like the `boids` list in main() (append, pop, len,
+    # iteration), handing out BoidView objects.
+    def __init__(self, draw_boid, capacity=64):
+        self.draw_boid = draw_boid
+        self.count = 0
+        self.positions = np.zeros((capacity, 2))
+        self.previous_positions = np.zeros((capacity, 2))
+        self.velocities = np.zeros((capacity, 2))
+        self.accelerations = np.zeros((capacity, 2))
+        self.colors = np.zeros((capacity, 3), dtype=np.uint8)
+        self.signal_times = np.zeros(capacity, dtype=np.int64)
+        self.received = np.zeros(capacity, dtype=bool)
+        self.views = []
+
+    def __len__(self):
+        return self.count
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __iter__(self):
+        return iter(self.views[:self.count])
+
+    def __getitem__(self, index):
+        return self.views[:self.count][index]
+
+    def _grow(self, capacity):
+        for name in ("positions", "previous_positions", "velocities", "accelerations", "colors", "signal_times", "received"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def append(self, boid):
+        # Copy a freshly made Boid (or anything with the same attributes) in
+        if self.count == len(self.positions):
+            self._grow(2 * len(self.positions))
+        i = self.count
+        self.positions[i] = tuple(boid.position)
+        self.previous_positions[i] = self.positions[i]
+        self.velocities[i] = tuple(boid.velocity)
+        self.accelerations[i] = tuple(boid.acceleration)
+        self.colors[i] = boid.color
+        self.signal_times[i] = boid.signal_time
+        self.received[i] = boid.has_received
+        self.count += 1
+        if len(self.views) < self.count:
+            self.views.append(BoidView(self, i))
+
+    def pop(self):
+        if self.count == 0:
+            raise IndexError("pop from empty swarm")
+        self.count -= 1
+        self.accelerations[self.count] = 0
+
+    def inside(self, left, top, right, bottom):
+        # Indices of the boids inside the rectangle, e.g. the part of the
+        # world in view, picked out with one comparison per array column
+        positions = self.positions[:self.count]
+        xs = positions[:, 0]
+        ys = positions[:, 1]
+        return np.flatnonzero((xs >= left) & (xs <= right) & (ys >= top) & (ys <= bottom))
+
+    def draw_arrays(self, alpha=1.0, indices=None):
+        # (positions, velocities, colors) of the boids (or those at indices)
+        # for drawing, positions alpha of the way from the previous ones
+        if indices is None:
+            indices = slice(0, self.count)
+        previous = self.previous_positions[indices]
+        positions = previous + (self.positions[indices] - previous) * alpha
+        return positions, self.velocities[indices], self.colors[indices]
+
+    def block_positions(self, blocks):
+        if not blocks:
+            return np.empty((0, 2))
+        return np.array([(block.position.x, block.position.y) for block in blocks], dtype=float)
+
+    def flock(self, blocks, neighbor_radius, separation_radius, object_separation_radius,
+              max_speed, max_force):
+        # Batch version of Boid.flock: alignment, cohesion and separation for
+        # every agent from the same snapshot, added into the accelerations.
+        n = self.count
+        if n == 0:
+            return
+        positions = self.positions[:n]
+        velocities = self.velocities[:n]
+
+        radius = max(neighbor_radius, separation_radius)
+        i, j, diff, dist = neighbor_pairs(positions, positions, radius, skip_self=True)
+
+        near = dist < neighbor_radius
+        near_i, near_j = i[near], j[near]
+        total = np.bincount(near_i, minlength=n).astype(float)
+        velocity_sum = sum_rows(near_i, velocities[near_j], n)
+        position_sum = sum_rows(near_i, positions[near_j], n)
+        has_neighbors = total > 0
+        safe_total = np.where(has_neighbors, total, 1)[:, None]
+        alignment = steer_towards(np.where(has_neighbors[:, None], velocity_sum / safe_total, 0),
+                                  velocities, max_speed, max_force)
+        cohesion = steer_towards(np.where(has_neighbors[:, None], position_sum / safe_total - positions, 0),
+                                 velocities, max_speed, max_force)
+
+        # Separation: unit vectors away from close boids and from blocks
+        close = dist < separation_radius
+        away_i = [i[close]]
+        away = [diff[close]]
+        away_dist = [dist[close]]
+        block_pos = self.block_positions(blocks)
+        bi, _, bdiff, bdist = neighbor_pairs(positions, block_pos, object_separation_radius, skip_self=False)
+        away_i.append(bi)
+        away.append(bdiff)
+        away_dist.append(bdist)
+        away_i = np.concatenate(away_i)
+        away = np.concatenate(away)
+        away_dist = np.concatenate(away_dist)
+        nonzero = away_dist != 0
+        away[nonzero] /= away_dist[nonzero, None]
+        away_total = np.bincount(away_i, minlength=n).astype(float)
+        away_sum = sum_rows(away_i, away, n)
+        away_sum /= np.where(away_total > 0, away_total, 1)[:, None]
+        separation = steer_towards(away_sum, velocities, max_speed, max_force)
+
+        self.accelerations[:n] += alignment * 1.0 + cohesion * 1.0 + separation * 1.5
+
+    def update(self, width, height, max_speed, now, scale=1.0):
+        # Batch version of Boid.update: integrate over `scale` reference
+        # frames, clamp speed, fade the signal color and bounce off the
+        # window edges.
+        n = self.count
+        if n == 0:
+            return
+        positions = self.positions[:n]
+        velocities = self.velocities[:n]
+        self.previous_positions[:n] = positions
+
+        velocities += self.accelerations[:n] * scale
+        limit(velocities, max_speed)
+        positions += velocities * scale
+        self.accelerations[:n] = 0
+
+        self.colors[:n][now - self.signal_times[:n] > 100] = (255, 255, 255)
+
+        for axis, size in ((0, width), (1, height)):
+            out = (positions[:, axis] <= 0) | (positions[:, axis] >= size)
+            velocities[out, axis] *= -1
+            np.clip(positions[:, axis], 0, size, out=positions[:, axis])
+
+    def bounce_off_blocks(self, blocks):
+        # Batch version of Boid.bounce_off_blocks, run after update()
+        n = self.count
+        if n == 0:
+            return
+        positions = self.positions[:n]
+        velocities = self.velocities[:n]
+        block_pos = self.block_positions(blocks)
+        if len(block_pos) == 0:
+            return
+        # A 5x5 rect at the (truncated) position against each 20x20 block
+        # rect. Every colliding block flips the velocity again, so only the
+        # parity of the flips matters.
+        corners = np.trunc(positions)
+        block_corners = np.trunc(block_pos)
+        # Overlapping corners are less than a block diagonal apart
+        i, j, _, _ = neighbor_pairs(corners, block_corners, 2 * BLOCK_SIZE, skip_self=False)
+        hit = ((corners[i, 0] < block_corners[j, 0] + BLOCK_SIZE) & (block_corners[j, 0] < corners[i, 0] + BOID_SIZE) &
+               (corners[i, 1] < block_corners[j, 1] + BLOCK_SIZE) & (block_corners[j, 1] < corners[i, 1] + BOID_SIZE))
+        i, j = i[hit], j[hit]
+        x, y = positions[i, 0], positions[i, 1]
+        flip_y = (block_corners[j, 0] <= x) & (x <= block_corners[j, 0] + BLOCK_SIZE)
+        flip_x = (block_corners[j, 1] <= y) & (y <= block_corners[j, 1] + BLOCK_SIZE)
+        velocities[np.bincount(i[flip_y], minlength=n) % 2 == 1, 1] *= -1
+        velocities[np.bincount(i[flip_x], minlength=n) % 2 == 1, 0] *= -1
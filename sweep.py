@@ -0,0 +1,131 @@
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import checkpoint
+from demos import load_demo
+
+# Settings of the simulation's World that can be swept
+PARAMETERS = ["max_speed", "max_force", "neighbor_radius", "broadcast_radius", "attraction_radius"]
+
+COLUMNS = PARAMETERS + ["seed", "boids", "goal_seconds", "in_goal", "steps", "wall_seconds"]
+HEADER = f"{'speed':>6} {'force':>6} {'neighbor':>8} {'broadcast':>9} {'attraction':>10} {'seed':>5} {'goal (s)':>8} {'in goal':>7}"
+
+
+def configure(world, task):
+    # The task's settings and seed
+    for option in PARAMETERS:
+        setattr(world, option, task[option])
+    world.rng.seed(task["seed"])
+
+
+def run_task(task):
+    # One seeded swarm-soccer run with the task's settings, until every
+    # MovableObject is held_in_goal or `timeout` simulated seconds pass.
+    # With a checkpoint, the run branches from the saved simulation and
+    # times are counted from there.
+    start = time.perf_counter()
+    if task["checkpoint"]:
+        sim = checkpoint.load(task["checkpoint"])
+        world = sim.world
+        configure(world, task)
+    else:
+        demo = load_demo("swarm-soccer")
+        world = demo.default_world()
+        configure(world, task)  # before spawning, which uses them
+        sim = demo.Simulation(num_boids=task["boids"], world=world)
+
+    branch_time = world.sim_time
+    goal_seconds = None
+    steps = 0
+    while world.sim_time - branch_time < task["timeout"] * 1000:
+        sim.step(task["dt"])
+        steps += 1
+        if all(obj.held_in_goal for obj in sim.objects):
+            goal_seconds = (world.sim_time - branch_time) / 1000
+            break
+
+    result = dict(task)
+    del result["timeout"], result["dt"], result["checkpoint"]
+    result.update({
+        "boids": len(sim.boids),
+        "goal_seconds": goal_seconds,
+        "in_goal": sum(obj.held_in_goal for obj in sim.objects),
+        "steps": steps,
+        "wall_seconds": time.perf_counter() - start,
+    })
+    return result
+
+
+def make_tasks(args):
+    tasks = []
+    values = [getattr(args, option) for option in PARAMETERS]
+    for combination in itertools.product(*values):
+        for seed in range(args.seed, args.seed + args.seeds):
+            task = dict(zip(PARAMETERS, combination))
+            task.update({"seed": seed, "boids": args.boids, "timeout": args.timeout, "dt": args.dt,
+                         "checkpoint": args.checkpoint})
+            tasks.append(task)
+    return tasks
+
+
+def format_row(result):
+    goal = "timeout" if result["goal_seconds"] is None else f"{result['goal_seconds']:.1f}"
+    return (f"{result['max_speed']:>6} {result['max_force']:>6} {result['neighbor_radius']:>8} "
+            f"{result['broadcast_radius']:>9} {result['attraction_radius']:>10} {result['seed']:>5} "
+            f"{goal:>8} {result['in_goal']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep swarm-soccer settings over seeded headless runs.")
+    parser.add_argument("--max-speed", nargs="+", type=float, default=[5])
+    parser.add_argument("--max-force", nargs="+", type=float, default=[1])
+    parser.add_argument("--neighbor-radius", nargs="+", type=int, default=[200])
+    parser.add_argument("--broadcast-radius", nargs="+", type=int, default=[100])
+    parser.add_argument("--attraction-radius", nargs="+", type=int, default=[100])
+    parser.add_argument("--seeds", type=int, default=3, help="runs per combination")
+    parser.add_argument("--seed", type=int, default=0, help="first seed")
+    parser.add_argument("--boids", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120, help="simulated seconds before a run gives up")
+    parser.add_argument("--dt", type=float, default=1000 / 30, help="simulated milliseconds per step")
+    parser.add_argument("--checkpoint", help="branch every run from this swarm-soccer checkpoint (--boids is ignored)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument("--output", default="sweep.csv", help="where to write the results table")
+    args = parser.parse_args()
+
+    tasks = make_tasks(args)
+    print(f"{len(tasks)} runs on {args.workers} workers")
+    print(HEADER)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(run_task, task) for task in tasks]
+        # Print each run as soon as it finishes, whatever order that is in
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(format_row(result), flush=True)
+
+    results.sort(key=lambda result: tuple(result[column] for column in PARAMETERS + ["seed"]))
+    with open(args.output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"Results written to {args.output}")
+
+    # Mean time to goal per combination; timeouts count as the timeout
+    print()
+    print("Summary (mean seconds to goal, timeouts counted as the timeout):")
+    for combination, group in itertools.groupby(results, key=lambda result: tuple(result[option] for option in PARAMETERS)):
+        group = list(group)
+        times = [args.timeout if result["goal_seconds"] is None else result["goal_seconds"] for result in group]
+        reached = sum(result["goal_seconds"] is not None for result in group)
+        settings = " ".join(f"{option}={value}" for option, value in zip(PARAMETERS, combination))
+        print(f"  {settings}: {sum(times) / len(times):.1f} s ({reached}/{len(group)} reached)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import csv
+import json
+import math
+import queue
+import threading
+
+# One row per sample, in this order in CSV files. Metrics a demo doesn't
+# have (pure-swarm has no balls or colony) are left empty.
+FIELDS = ["frame", "sim_time", "frame_ms", "agents", "mean_speed", "polarization", "receivers",
+          "objects_in_goal", "food", "larva", "dropped"]
+
+
+def flock_motion(boids):
+    # (mean speed, polarization) of the swarm. Polarization is the length of
+    # the mean heading, from 0 (headings cancel out) to 1 (every boid
+    # heading the same way).
+    if hasattr(boids, "velocities"):
+        # The NumPy engine: on its arrays
+        velocities = boids.velocities[:boids.count]
+        speeds = (velocities ** 2).sum(axis=1) ** 0.5
+        moving = speeds > 0
+        if not moving.any():
+            return 0.0, 0.0
+        headings = velocities[moving] / speeds[moving][:, None]
+        sum_x, sum_y = headings.sum(axis=0)
+        return float(speeds.mean()), float(math.hypot(sum_x, sum_y) / moving.sum())
+    total_speed = 0.0
+    sum_x = sum_y = 0.0
+    moving = 0
+    for boid in boids:
+        velocity = boid.velocity
+        speed = math.hypot(velocity.x, velocity.y)
+        if speed > 0:
+            total_speed += speed
+            sum_x += velocity.x / speed
+            sum_y += velocity.y / speed
+            moving += 1
+    if not moving:
+        return 0.0, 0.0
+    return total_speed / len(boids), math.hypot(sum_x, sum_y) / moving
+
+
+def polarization(boids):
+    return flock_motion(boids)[1]
+
+
+def sample(sim, frame_ms):
+    # The metrics of sim after its last step, as a dict with FIELDS as keys
+    world = sim.world
+    mean_speed, heading = flock_motion(sim.boids)
+    objects = getattr(sim, "objects", None)
+    return {
+        "frame": sim.frames,
+        "sim_time": world.sim_time,
+        "frame_ms": frame_ms,
+        "agents": len(sim.boids),
+        "mean_speed": mean_speed,
+        "polarization": heading,
+        # Boids a broadcast reached in the last step
+        "receivers": sum(report.reach for report in world.broadcasts.reports),
+        "objects_in_goal": None if objects is None else sum(obj.held_in_goal for obj in objects),
+        "food": getattr(world, "food", None),
+        "larva": getattr(world, "larva", None),
+    }
+
+
+class TelemetryWriter:
+    # Writes samples to a JSONL or CSV file (by the file's extension) from a
+    # background thread, so the loop producing them never waits for the
+    # disk. Samples go through a queue of at most max_queue; when the writer
+    # falls that far behind, new samples are dropped rather than waited for,
+    # and counted in `dropped` (written with every row, so gaps are visible).
+    # Callers ask due() every frame and sample one in `every` frames.
+    def __init__(self, path, max_queue=1000, every=1):
+        self.path = path
+        self.format = "csv" if path.endswith(".csv") else "jsonl"
+        self.every = max(1, every)
+        self.frames = 0
+        self.dropped = 0
+        self.written = 0
+        self.error = None  # the exception that stopped the writer, if any
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.file = open(path, "w", newline="")
+        self.thread = threading.Thread(target=self._write, name="telemetry", daemon=True)
+        self.thread.start()
+
+    def due(self):
+        # Counts a frame; True if this one should be sampled
+        due = self.frames % self.every == 0
+        self.frames += 1
+        return due
+
+    def submit(self, row):
+        row["dropped"] = self.dropped
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write(self):
+        # Runs on the thread. If writing fails (disk full, a value JSON
+        # can't encode), the error is kept in `error` and the rest of the
+        # queue is taken and thrown away, so submit() and close() never
+        # wait on a writer that has stopped.
+        try:
+            if self.format == "csv":
+                writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+                writer.writeheader()
+                write = writer.writerow
+            else:
+                def write(row):
+                    self.file.write(json.dumps(row) + "\n")
+        except Exception as error:
+            self.error = error
+        while True:
+            row = self.queue.get()
+            if row is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                write(row)
+                self.written += 1
+                if self.queue.empty():
+                    self.file.flush()  # caught up: make what's there readable
+            except Exception as error:
+                self.error = error
+        try:
+            self.file.close()
+        except Exception as error:
+            if self.error is None:
+                self.error = error
+
+    def close(self):
+        # Writes out what's still queued, then closes the file. A failed
+        # write is not raised here; check `error` afterwards.
+        while self.thread.is_alive():
+            try:
+                self.queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                continue  # still draining; waited on only while the thread runs
+        self.thread.join()
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
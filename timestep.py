@@ -0,0 +1,30 @@
+class FixedTimestep:
+    # Turns variable frame times into a whole number of fixed simulation
+    # steps. Real time is collected in an accumulator and paid out in steps
+    # of step_ms; what's left over is `alpha`, how far the clock is into the
+    # next step, used to interpolate drawn positions between the last two
+    # steps. At most max_steps run per frame, and time beyond that is
+    # dropped, so a slow frame can't make the following frames slower too.
+    def __init__(self, step_ms, max_steps=4):
+        self.step_ms = step_ms
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.dropped_ms = 0.0  # real time skipped because of max_steps
+
+    def advance(self, frame_ms, step):
+        # Calls step(step_ms) once per fixed step due; returns how many ran
+        self.accumulator += frame_ms
+        steps = 0
+        while self.accumulator >= self.step_ms and steps < self.max_steps:
+            step(self.step_ms)
+            self.accumulator -= self.step_ms
+            steps += 1
+        if self.accumulator >= self.step_ms:
+            behind = self.accumulator - self.accumulator % self.step_ms
+            self.dropped_ms += behind
+            self.accumulator -= behind
+        return steps
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.step_ms
@@ -0,0 +1,151 @@
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
+# A trajectory file is a header followed by one record per recorded step,
+# everything little-endian:
+#   header: magic, version, world width and height
+#   record: sim_time (float64), boid count n, object count m (uint32), then
+#           float32 values: n (x, y) positions, n (x, y) velocities and m
+#           (x, y, vx, vy, size, held_in_goal) objects
+# Records are only ever appended, so a run can be recorded for hours and the
+# file read while it is still being written.
+MAGIC = b"SWTR"
+VERSION = 1
+HEADER = struct.Struct("<4sIII")
+RECORD = struct.Struct("<dII")
+OBJECT_FIELDS = 6
+FLOAT_SIZE = 4
+
+
+class TrajectoryRecorder:
+    # Appends the boids and movable objects of a Simulation to a trajectory
+    # file; call record(sim) after the steps to keep
+    def __init__(self, path, world):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, int(world.width), int(world.height)))
+        self.records = 0
+
+    def record(self, sim):
+        boids = sim.boids
+        objects = getattr(sim, "objects", ())  # pure-swarm has none
+        self.file.write(RECORD.pack(sim.world.sim_time, len(boids), len(objects)))
+        if hasattr(boids, "positions"):
+            # The NumPy engine: straight from its arrays
+            count = boids.count
+            self.file.write(boids.positions[:count].astype("<f4").tobytes())
+            self.file.write(boids.velocities[:count].astype("<f4").tobytes())
+        else:
+            positions = array("f")
+            velocities = array("f")
+            for boid in boids:
+                position = boid.position
+                velocity = boid.velocity
+                positions.append(position.x)
+                positions.append(position.y)
+                velocities.append(velocity.x)
+                velocities.append(velocity.y)
+            self.write(positions)
+            self.write(velocities)
+        values = array("f")
+        for obj in objects:
+            values.extend((obj.position.x, obj.position.y, obj.velocity.x, obj.velocity.y, obj.size,
+                           getattr(obj, "held_in_goal", False)))
+        self.write(values)
+        self.records += 1
+
+    def write(self, values):
+        if sys.byteorder == "big":
+            values.byteswap()
+        values.tofile(self.file)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TrajectoryFrame:
+    # One record, as float32 arrays copied out of the mapped file (so the
+    # file can be closed while frames are still around): positions and
+    # velocities hold x, y pairs, objects OBJECT_FIELDS values per object
+    __slots__ = ("sim_time", "positions", "velocities", "objects")
+
+    def __init__(self, sim_time, positions, velocities, objects):
+        self.sim_time = sim_time
+        self.positions = positions
+        self.velocities = velocities
+        self.objects = objects
+
+
+class Trajectory:
+    # A trajectory file, memory-mapped. Opening it only reads the record
+    # headers to find where each record starts; frame(i) then reads that one
+    # record, so files far bigger than RAM can be scrubbed through. A record
+    # cut short (the recorder is still writing) is left out.
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < HEADER.size:
+            raise ValueError(f"{path} is not a trajectory file")
+        magic, version, self.width, self.height = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a trajectory file")
+        if version != VERSION:
+            raise ValueError(f"{path} is trajectory version {version}, expected {VERSION}")
+        self.offsets = array("Q")  # where each record starts
+        self.times = array("d")  # and its sim_time, for seeking
+        offset = HEADER.size
+        end = len(self.map)
+        while offset + RECORD.size <= end:
+            sim_time, boids, objects = RECORD.unpack_from(self.map, offset)
+            size = RECORD.size + (4 * boids + OBJECT_FIELDS * objects) * FLOAT_SIZE
+            if offset + size > end:
+                break
+            self.offsets.append(offset)
+            self.times.append(sim_time)
+            offset += size
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def frame(self, index):
+        offset = self.offsets[index]
+        sim_time, boids, objects = RECORD.unpack_from(self.map, offset)
+        offset += RECORD.size
+        pairs = 2 * boids * FLOAT_SIZE
+        # The view is released before returning; a view still exported
+        # would make closing the map fail
+        with memoryview(self.map) as view:
+            positions = self.floats(view[offset:offset + pairs])
+            velocities = self.floats(view[offset + pairs:offset + 2 * pairs])
+            offset += 2 * pairs
+            values = self.floats(view[offset:offset + OBJECT_FIELDS * objects * FLOAT_SIZE])
+        return TrajectoryFrame(sim_time, positions, velocities, values)
+
+    def floats(self, view):
+        values = array("f")
+        values.frombytes(view)
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+    def index_at(self, sim_time):
+        # The last record at or before sim_time (the first one if none is)
+        return max(0, bisect_right(self.times, sim_time) - 1)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,74 @@
+import pygame
+
+
+class TextCache:
+    # Rendered text surfaces keyed by (text, color). The font is loaded once,
+    # on first use, and a label is only rendered again when its text changes.
+    # The cache is emptied when it reaches `limit` entries, so counters that
+    # keep growing (FOOD, LARVA, ...) can't fill memory.
+    def __init__(self, size=15, limit=256):
+        self.size = size
+        self.limit = limit
+        self.font = None
+        self.surfaces = {}
+
+    def render(self, text, color):
+        key = (text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            if self.font is None:
+                self.font = pygame.font.SysFont(None, self.size)
+            if len(self.surfaces) >= self.limit:
+                self.surfaces.clear()
+            surface = self.font.render(text, True, color)
+            self.surfaces[key] = surface
+        return surface
+
+
+class UIPanel:
+    # The buttons and labels in the top-left corner, kept on one transparent
+    # surface. The surface is redrawn only when a label's text changes;
+    # otherwise draw() is a single blit.
+    def __init__(self, text_color=(255, 255, 255), button_color=(255, 255, 255), button_text_color=(0, 0, 0)):
+        self.text_color = text_color
+        self.button_color = button_color
+        self.button_text_color = button_text_color
+        self.text = TextCache()
+        self.buttons = []  # (rect, label) in the order they were added
+        self.labels = []  # (position, text)
+        self.surface = None
+
+    def add_button(self, rect, label=None):
+        self.buttons.append((rect, label))
+        self.surface = None
+        return rect
+
+    def rects(self):
+        return [rect for rect, label in self.buttons]
+
+    def set_labels(self, labels):
+        # labels is a list of (position, text); anything that changed since
+        # the last call marks the panel for redrawing
+        if labels != self.labels:
+            self.labels = labels
+            self.surface = None
+
+    def _redraw(self):
+        labels = [(position, self.text.render(text, self.text_color)) for position, text in self.labels]
+        width = max([rect.right for rect, label in self.buttons]
+                    + [x + surface.get_width() for (x, y), surface in labels] + [1])
+        height = max([rect.bottom for rect, label in self.buttons]
+                     + [y + surface.get_height() for (x, y), surface in labels] + [1])
+        self.surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        for rect, label in self.buttons:
+            pygame.draw.rect(self.surface, self.button_color, rect)
+            if label:
+                text = self.text.render(label, self.button_text_color)
+                self.surface.blit(text, text.get_rect(center=rect.center))
+        for position, surface in labels:
+            self.surface.blit(surface, position)
+
+    def draw(self, screen):
+        if self.surface is None:
+            self._redraw()
+        screen.blit(self.surface, (0, 0))
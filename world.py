@@ -0,0 +1,80 @@
+import random
+
+from cell_aggregates import CellAggregates
+from neighbor_list import NeighborList
+from object_index import ObjectIndex
+from obstacles import ObstacleMap
+from propagation import BroadcastQueue
+from spatial_grid import SpatialGrid
+
+
+class World:
+    # Settings and shared state of one simulation: everything Boid and
+    # MovableObject methods used to read from module globals. Every
+    # Simulation owns its own World, so any number of them can be stepped
+    # side by side in one process. The constants at the top of each demo
+    # are only the defaults (see default_world() there).
+    __slots__ = (
+        "width", "height",
+        "max_speed", "max_force", "object_push_force",
+        "neighbor_radius", "separation_radius", "object_separation_radius", "neighbor_skin",
+        "flock_approximation", "steering_slices", "steering_budget",
+        "attraction_radius", "broadcast_radius", "target_hold_time",
+        "sim_step_ms", "max_substeps",
+        "sim_time", "step_scale", "rng",
+        "neighbor_grid", "neighbor_list", "cell_aggregates", "broadcasts", "obstacle_map", "object_index",
+    )
+
+    def __init__(self, width=1000, height=1000, max_speed=5, max_force=1, object_push_force=0.2,
+                 neighbor_radius=200, separation_radius=30, object_separation_radius=50,
+                 attraction_radius=100, broadcast_radius=100, target_hold_time=3000,
+                 sim_step_ms=1000 / 30, max_substeps=4, neighbor_skin=40,
+                 flock_approximation=None, steering_slices=1, steering_budget=1000, seed=None):
+        self.width = width
+        self.height = height
+        self.max_speed = max_speed
+        self.max_force = max_force
+        self.object_push_force = object_push_force
+        self.neighbor_radius = neighbor_radius
+        self.separation_radius = separation_radius
+        self.object_separation_radius = object_separation_radius
+        self.neighbor_skin = neighbor_skin  # margin of the cached neighbor lists
+        # None: exact flocking. 0 to 1: alignment and cohesion from per-cell
+        # sums, approximating more of them the higher it is (0 is exact)
+        self.flock_approximation = flock_approximation
+        # Flocking forces are recomputed each step for one in steering_slices
+        # boids, round-robin; the others keep their last ones. 0 picks the
+        # number of slices so that about steering_budget boids are
+        # recomputed per step.
+        self.steering_slices = steering_slices
+        self.steering_budget = steering_budget
+        self.attraction_radius = attraction_radius
+        self.broadcast_radius = broadcast_radius
+        self.target_hold_time = target_hold_time  # ms a ball must stay in the goal
+        self.sim_step_ms = sim_step_ms
+        self.max_substeps = max_substeps
+
+        # Simulation clock in milliseconds, advanced by Simulation.step().
+        # Timers use this instead of pygame.time.get_ticks() so headless
+        # runs can go faster than real time.
+        self.sim_time = 0
+        # Length of the current step in reference frames (30 FPS frames)
+        self.step_scale = 1.0
+        # Every random number of the simulation (spawn points, headings, the
+        # soccer ants' wander) comes from here, so a seeded World replays
+        # exactly, whatever else uses the random module
+        self.rng = random.Random(seed)
+
+        # Spatial hash of boid positions, rebuilt once per step
+        self.neighbor_grid = SpatialGrid(max(neighbor_radius, separation_radius), width, height)
+        # Per-boid candidates within both radii plus neighbor_skin, reused
+        # until a boid has moved half the skin
+        self.neighbor_list = NeighborList()
+        # Per-cell boid sums, used instead when flock_approximation is set
+        self.cell_aggregates = CellAggregates()
+        # Messages from Boid.broadcast(), delivered once per step
+        self.broadcasts = BroadcastQueue()
+        # Blocks as a bitmap and repulsion field, synced with Simulation.blocks
+        self.obstacle_map = ObstacleMap()
+        # Movable objects (the soccer balls) by position, rebuilt once per step
+        self.object_index = ObjectIndex()